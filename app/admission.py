@@ -0,0 +1,152 @@
+# app/admission.py
+import asyncio
+import math
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, Set
+
+from app.config import settings
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+# Who the current request is charged to (the bearer token on /hackrx/run).
+# Set once per request; tasks and to_thread calls inherit it.
+current_tenant: ContextVar[str] = ContextVar("current_tenant", default="anonymous")
+
+
+class AdmissionRejected(Exception):
+    """
+    A stage's wait queue is full (or the wait timed out). Surfaced as 503.
+    """
+
+    def __init__(self, stage: str, retry_after: int):
+        super().__init__(f"{stage} capacity exhausted, retry in {retry_after}s")
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+class StagePool:
+    """
+    Service-wide capacity for one pipeline stage, with a bounded wait queue
+    and a per-tenant fair share of the slots: while a tenant under its
+    share (`ceil(capacity / active_tenants)`) is waiting, tenants at or
+    over their share are not admitted. Without contention any free slot
+    is used.
+    """
+
+    def __init__(self, name: str, capacity: int, max_queue: int, wait_timeout: float):
+        self.name = name
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.wait_timeout = wait_timeout
+        self.in_use = 0
+        self.waiting = 0
+        self._held: Dict[str, int] = defaultdict(int)
+        self._queued: Dict[str, int] = defaultdict(int)
+        self._cond = asyncio.Condition()
+
+    def fair_share(self) -> int:
+        active = {t for t, n in self._held.items() if n} | {t for t, n in self._queued.items() if n}
+        return max(1, math.ceil(self.capacity / max(1, len(active))))
+
+    def _can_run(self, tenant: str) -> bool:
+        if self.in_use >= self.capacity:
+            return False
+        share = self.fair_share()
+        if self._held[tenant] < share:
+            return True
+        # over its share: still fine while no under-share tenant is waiting,
+        # so idle slots are never left unused
+        return not any(
+            n and t != tenant and self._held[t] < share for t, n in self._queued.items()
+        )
+
+    def _reject(self) -> AdmissionRejected:
+        logger.warning(f"admission: rejecting {self.name} ({self.in_use} running, {self.waiting} queued)")
+        return AdmissionRejected(self.name, settings.ADMISSION_RETRY_AFTER)
+
+    async def acquire(self, tenant: str) -> None:
+        async with self._cond:
+            if not self._can_run(tenant):
+                if self.waiting >= self.max_queue:
+                    raise self._reject()
+                self.waiting += 1
+                self._queued[tenant] += 1
+                try:
+                    await asyncio.wait_for(
+                        self._cond.wait_for(lambda: self._can_run(tenant)),
+                        self.wait_timeout,
+                    )
+                except asyncio.TimeoutError:
+                    raise self._reject()
+                finally:
+                    self.waiting -= 1
+                    self._queued[tenant] -= 1
+            self.in_use += 1
+            self._held[tenant] += 1
+
+    async def release(self, tenant: str) -> None:
+        async with self._cond:
+            self.in_use -= 1
+            self._held[tenant] -= 1
+            self._cond.notify_all()
+
+    @asynccontextmanager
+    async def slot(self, tenant: str = None):
+        tenant = tenant or current_tenant.get()
+        await self.acquire(tenant)
+        try:
+            yield
+        finally:
+            await self.release(tenant)
+
+    async def run_in_thread(self, fn, *args, **kwargs):
+        """
+        `asyncio.to_thread` behind a slot. A thread cannot be interrupted,
+        so the slot stays held until it finishes even when the caller stops
+        waiting (timeout, cancellation); otherwise abandoned threads would
+        push real concurrency past `capacity`.
+        """
+        tenant = current_tenant.get()
+        await self.acquire(tenant)
+
+        async def run():
+            try:
+                return await asyncio.to_thread(fn, *args, **kwargs)
+            finally:
+                await self.release(tenant)
+
+        task = asyncio.create_task(run())
+        _detached.add(task)
+        task.add_done_callback(_detached.discard)
+        return await asyncio.shield(task)
+
+
+# threads still holding a slot after their caller gave up
+_detached: Set[asyncio.Task] = set()
+
+
+def _pool(name: str, capacity: int) -> StagePool:
+    return StagePool(name, capacity, settings.ADMISSION_MAX_QUEUE, settings.ADMISSION_WAIT_TIMEOUT)
+
+
+pools: Dict[str, StagePool] = {
+    "download": _pool("download", settings.ADMISSION_DOWNLOAD),
+    "parse":    _pool("parse",    settings.ADMISSION_PARSE),
+    "embed":    _pool("embed",    settings.ADMISSION_EMBED),
+    "llm":      _pool("llm",      settings.ADMISSION_LLM),
+}
+
+
+def slot(stage: str, tenant: str = None):
+    return pools[stage].slot(tenant)
+
+
+async def run_in_thread(stage: str, fn, *args, **kwargs):
+    """
+    `asyncio.to_thread` behind the stage's admission slot (held until the
+    thread finishes, see `StagePool.run_in_thread`).
+    """
+    return await pools[stage].run_in_thread(fn, *args, **kwargs)
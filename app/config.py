@@ -10,6 +10,44 @@ class Settings(BaseSettings):
     AWS_REGION: str
     JINA_API_KEY: str
 
+    # ephemeral /hackrx/run documents (per-request namespaces)
+    EPHEMERAL_TTL_SECONDS: int = 3600
+    EPHEMERAL_REAP_INTERVAL_SECONDS: int = 300
+
+    # background ingest jobs
+    JOBS_DB_PATH: str = "data/jobs.db"
+    JOB_WORKERS: int = 2
+    JOB_MAX_ATTEMPTS: int = 3       # runs per job before an interrupted one is failed
+
+    # shared outbound HTTP pools (app/http_client.py)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_PER_HOST_LIMIT: int = 20
+    HTTP2: bool = True
+    DNS_CACHE_TTL: int = 60          # getaddrinfo hides record TTLs; keep this short
+    DNS_CACHE_SIZE: int = 256
+
+    # service-wide admission control: concurrent slots per stage
+    ADMISSION_DOWNLOAD: int = 16
+    ADMISSION_PARSE: int = 4
+    ADMISSION_EMBED: int = 8
+    ADMISSION_LLM: int = 16
+    ADMISSION_MAX_QUEUE: int = 64
+    ADMISSION_WAIT_TIMEOUT: float = 30.0
+    ADMISSION_RETRY_AFTER: int = 5
+
+    # per-request deadline budget (overridable with X-Request-Deadline-Ms)
+    REQUEST_DEADLINE_SECONDS: float = 60.0
+    DEADLINE_LOW_WATER_SECONDS: float = 10.0
+
+    # first-pass vector profile, see app/embedding_profiles.py
+    EMBEDDING_PROFILE: str = "full"
+
+    # small documents skip embedding/retrieval and go to the LLM whole (0 disables)
+    DIRECT_CONTEXT_MAX_TOKENS: int = 32000
+    DIRECT_CONTEXT_CACHE: bool = False
+
     model_config = SettingsConfigDict(env_file=".env")
 
 settings = Settings()
@@ -0,0 +1,74 @@
+# app/deadline.py
+import time
+from typing import Optional
+
+from app.config import settings
+
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
+
+# a stage timeout that fires with less than this left was the deadline's doing
+DEADLINE_SLACK = 0.5
+
+
+class DeadlineExceeded(Exception):
+    """
+    The request's time budget ran out before a required stage could start.
+    """
+
+
+class Deadline:
+    """
+    A per-request time budget. Stages ask it for their own timeout
+    (`timeout(cap)`) instead of picking one independently, and check
+    `low()` to decide whether to take a cheaper path.
+    """
+
+    def __init__(self, seconds: float):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def low(self) -> bool:
+        return self.remaining() < settings.DEADLINE_LOW_WATER_SECONDS
+
+    def timeout(self, cap: float) -> float:
+        left = self.remaining()
+        if left <= 0:
+            raise DeadlineExceeded(f"request deadline of {self.budget:.1f}s exceeded")
+        return min(cap, left)
+
+    @classmethod
+    def from_header(cls, value: Optional[str]) -> "Deadline":
+        """
+        Budget from the `X-Request-Deadline-Ms` header if present and sane,
+        otherwise REQUEST_DEADLINE_SECONDS.
+        """
+        try:
+            ms = float(value) if value else 0
+        except ValueError:
+            ms = 0
+        return cls(ms / 1000 if ms > 0 else settings.REQUEST_DEADLINE_SECONDS)
+
+
+def timeout_for(deadline: Optional[Deadline], cap: float) -> float:
+    """
+    A stage's timeout: its own `cap`, clipped to what is left of `deadline`.
+    """
+    return deadline.timeout(cap) if deadline else cap
+
+
+def is_low(deadline: Optional[Deadline]) -> bool:
+    return bool(deadline and deadline.low())
+
+
+def exhausted(deadline: Optional[Deadline]) -> bool:
+    """
+    Whether `deadline` is (all but) spent, i.e. a client-library timeout
+    that just fired came from the clipped budget rather than a slow service.
+    """
+    return bool(deadline and deadline.remaining() < DEADLINE_SLACK)
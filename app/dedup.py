@@ -0,0 +1,163 @@
+# app/dedup.py
+import hashlib
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Set
+
+import numpy as np
+
+from app.s3_storage import load_json_tagged, save_json_if
+
+SHINGLE_WORDS  = 5
+NUM_PERM       = 64
+BANDS          = 16           # 16 bands x 4 rows: candidates from ~0.5 Jaccard
+NEAR_DUP_MIN   = 0.85         # estimated Jaccard needed to treat as the same chunk
+_PRIME         = (1 << 31) - 1
+
+def registry_key(index: str) -> str:
+    # one registry per Pinecone index: a new embedding profile starts empty
+    return f"dedup/{index}.json"
+
+
+_rng   = np.random.default_rng(20240801)   # fixed: signatures must be stable across runs
+_PERM_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+
+
+def normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def fingerprint(text: str) -> str:
+    return hashlib.sha1(normalize(text).encode("utf-8")).hexdigest()
+
+
+def minhash(text: str) -> np.ndarray:
+    """
+    MinHash signature over word `SHINGLE_WORDS`-grams of the normalised text.
+    """
+    words = normalize(text).split(" ")
+    n = max(1, len(words) - SHINGLE_WORDS + 1)
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(n)}
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") % _PRIME
+         for s in shingles],
+        dtype=np.uint64,
+    )
+    perms = (hashes[:, None] * _PERM_A[None, :] + _PERM_B[None, :]) % _PRIME
+    return perms.min(axis=0)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+
+@dataclass
+class DedupPlan:
+    """
+    What one document's ingest has to do to the index.
+    """
+    new: Dict[str, str] = field(default_factory=dict)           # chunk id -> text to upsert
+    reuse: Dict[str, str] = field(default_factory=dict)         # new chunk id -> near duplicate to copy the embedding from
+    members: Dict[str, List[str]] = field(default_factory=dict)  # chunk id -> documents (changed)
+    deleted: List[str] = field(default_factory=list)             # chunk ids no longer used
+    chunk_ids: List[str] = field(default_factory=list)           # the document's chunks, in order
+
+
+class ChunkRegistry:
+    """
+    Chunk fingerprints for the long-lived corpus. Exact duplicates (same
+    normalised SHA-1) share one vector that lists the documents it belongs
+    to. Near duplicates (MinHash + LSH) keep their own vector and text, so
+    a changed term is never answered with another document's wording, but
+    may reuse the neighbour's embedding instead of calling Jina.
+    Persisted as one JSON object in S3 per index; `save` only succeeds if
+    nobody else saved since `load` (ConditionalWriteFailed otherwise).
+    """
+
+    def __init__(self, data: dict = None, key: str = None, etag: str = None):
+        data = data or {}
+        self.key  = key
+        self.etag = etag
+        self.chunks: Dict[str, dict] = data.get("chunks", {})       # id -> {docs, minhash}
+        self.documents: Dict[str, List[str]] = data.get("documents", {})
+        self.sources: Dict[str, str] = data.get("sources", {})      # doc -> source file
+        self._buckets: Dict[str, Set[str]] = {}
+        for cid, c in self.chunks.items():
+            self._index(cid, np.array(c["minhash"], dtype=np.uint64))
+
+    @classmethod
+    def load(cls, key: str) -> "ChunkRegistry":
+        data, etag = load_json_tagged(key)
+        return cls(data, key, etag)
+
+    def save(self) -> None:
+        data = {"chunks": self.chunks, "documents": self.documents, "sources": self.sources}
+        self.etag = save_json_if(self.key, data, self.etag)
+
+    def sources_for(self, docs: List[str]) -> List[str]:
+        """
+        Source file of each document in `docs`, in the same order.
+        """
+        return [self.sources.get(d, d) for d in docs]
+
+    def _bands(self, sig: np.ndarray) -> List[str]:
+        rows = NUM_PERM // BANDS
+        return [f"{b}:{sig[b * rows:(b + 1) * rows].tobytes().hex()}" for b in range(BANDS)]
+
+    def _index(self, cid: str, sig: np.ndarray) -> None:
+        for key in self._bands(sig):
+            self._buckets.setdefault(key, set()).add(cid)
+
+    def _unindex(self, cid: str) -> None:
+        sig = np.array(self.chunks[cid]["minhash"], dtype=np.uint64)
+        for key in self._bands(sig):
+            self._buckets.get(key, set()).discard(cid)
+
+    def _near_duplicate(self, sig: np.ndarray) -> str:
+        best, best_sim = None, NEAR_DUP_MIN
+        for key in self._bands(sig):
+            for cid in self._buckets.get(key, ()):
+                sim = similarity(sig, np.array(self.chunks[cid]["minhash"], dtype=np.uint64))
+                if sim >= best_sim:
+                    best, best_sim = cid, sim
+        return best
+
+    def assign(self, doc: str, chunks: List[str], source: str = None) -> DedupPlan:
+        """
+        Map `doc`'s chunks onto unique chunk ids, registering new ones.
+        Re-ingesting a document replaces its previous chunk set.
+        """
+        plan = DedupPlan()
+        if source:
+            self.sources[doc] = source
+        for text in chunks:
+            cid = f"chunk-{fingerprint(text)[:24]}"
+            if cid not in self.chunks and cid not in plan.new:
+                sig = minhash(text)
+                near = self._near_duplicate(sig)
+                if near and near not in plan.new:   # only chunks already in the index
+                    plan.reuse[cid] = near
+                self.chunks[cid] = {"docs": [], "minhash": sig.tolist()}
+                self._index(cid, sig)
+                plan.new[cid] = text
+            if cid not in plan.chunk_ids:
+                plan.chunk_ids.append(cid)
+
+        previous = set(self.documents.get(doc, []))
+        current  = set(plan.chunk_ids)
+        for cid in current - previous:
+            self.chunks[cid]["docs"].append(doc)
+            plan.members[cid] = self.chunks[cid]["docs"]
+        for cid in previous - current:
+            docs = self.chunks[cid]["docs"]
+            if doc in docs:
+                docs.remove(doc)
+            if docs:
+                plan.members[cid] = docs
+            else:
+                self._unindex(cid)
+                del self.chunks[cid]
+                plan.deleted.append(cid)
+        self.documents[doc] = plan.chunk_ids
+        return plan
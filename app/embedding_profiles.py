@@ -0,0 +1,167 @@
+# app/embedding_profiles.py
+import base64
+import math
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+
+from app.config import settings
+
+FULL_DIMENSION = 1024
+
+
+@dataclass(frozen=True)
+class EmbeddingProfile:
+    """
+    How vectors are stored for the first-pass search.
+
+    `dimension` truncates Jina v3's Matryoshka embeddings, `quantization`
+    is "float", "int8" or "binary", and `oversample` widens the first-pass
+    shortlist (top_k * oversample) that is then rescored against the full
+    1024-d embedding, which recovers what truncation and quantization lost.
+    """
+    name: str
+    dimension: int
+    quantization: str = "float"
+    oversample: int = 1
+
+    @property
+    def rescores(self) -> bool:
+        return self.name != "full"
+
+    def first_pass_bytes(self) -> int:
+        """
+        Size of the first-pass representation in a store that keeps it natively.
+        """
+        if self.quantization == "binary":
+            return self.dimension // 8
+        if self.quantization == "int8":
+            return self.dimension
+        return self.dimension * 4
+
+    def rescore_bytes(self) -> int:
+        """
+        Size of the base64 float16 full vector kept in metadata (0 for the baseline).
+        """
+        return 4 * math.ceil(FULL_DIMENSION * 2 / 3) if self.rescores else 0
+
+    def stored_bytes(self) -> int:
+        """
+        What one vector really costs in Pinecone: float32 values (it stores
+        quantized levels as float32 too) plus the rescore payload.
+        """
+        return self.dimension * 4 + self.rescore_bytes()
+
+    def query_bytes(self, top_k: int) -> int:
+        """
+        Rescore payloads fetched with the shortlist for one query.
+        """
+        return top_k * self.oversample * self.rescore_bytes()
+
+
+PROFILES: Dict[str, EmbeddingProfile] = {
+    p.name: p for p in [
+        EmbeddingProfile("full",        FULL_DIMENSION),
+        EmbeddingProfile("d512",        512, "float",  2),
+        EmbeddingProfile("d256",        256, "float",  3),
+        EmbeddingProfile("d256-int8",   256, "int8",   4),
+        EmbeddingProfile("d256-binary", 256, "binary", 8),
+        EmbeddingProfile("d128-binary", 128, "binary", 10),
+    ]
+}
+
+
+def get_profile(name: str = None) -> EmbeddingProfile:
+    name = name or settings.EMBEDDING_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown embedding profile: {name}")
+    return PROFILES[name]
+
+
+def truncate(vectors: np.ndarray, dimension: int) -> np.ndarray:
+    """
+    Matryoshka truncation: keep the leading dimensions and re-normalise.
+    """
+    out = np.ascontiguousarray(vectors[:, :dimension], dtype=np.float32)
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return out / norms
+
+
+def quantize(vectors: np.ndarray, quantization: str) -> np.ndarray:
+    """
+    First-pass values. Cosine is scale-invariant, so int8 levels and ±1
+    signs are kept as float32 (what Pinecone stores) without rescaling.
+    """
+    if quantization == "float":
+        return vectors
+    if quantization == "int8":
+        scale = np.abs(vectors).max(axis=1, keepdims=True)
+        scale[scale == 0] = 1.0
+        return np.round(vectors / scale * 127).astype(np.float32)
+    if quantization == "binary":
+        return np.where(vectors > 0, 1.0, -1.0).astype(np.float32)
+    raise ValueError(f"Unknown quantization: {quantization}")
+
+
+def encode_rescore(vector: np.ndarray) -> str:
+    """
+    Compact float16 copy of the full-dimension vector, stored in metadata
+    and used to rescore the shortlist.
+    """
+    return base64.b64encode(vector.astype("<f2").tobytes()).decode("ascii")
+
+
+def decode_rescore(payload: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(payload), dtype="<f2").astype(np.float32)
+
+
+def prepare(vectors: np.ndarray, profile: EmbeddingProfile):
+    """
+    Split full-dimension embeddings into (first-pass values, rescore
+    payloads). Payloads are None for the baseline profile.
+    """
+    reduced = truncate(vectors, profile.dimension)
+    if not profile.rescores:
+        return reduced, None
+    full = truncate(vectors, FULL_DIMENSION)
+    return quantize(reduced, profile.quantization), [encode_rescore(v) for v in full]
+
+
+def rescore(query: np.ndarray, matches: List[Dict], top_k: int) -> List[Dict]:
+    """
+    Re-rank first-pass `matches` (each with a "rescore" payload) by cosine
+    against the full-dimension float query, keeping the best `top_k`.
+    """
+    if not matches:
+        return []
+    cands = np.stack([decode_rescore(m["rescore"]) for m in matches])
+    scores = cands @ query
+    order = np.argsort(-scores)[:top_k]
+    return [dict(matches[i], score=float(scores[i])) for i in order]
+
+
+def search_local(docs: np.ndarray, queries: np.ndarray, profile: EmbeddingProfile, top_k: int) -> np.ndarray:
+    """
+    Offline simulation of the profile's two-pass search over full-dimension
+    `docs`; returns the top_k doc indices per query. Used by the recall report.
+    """
+    doc_values, doc_payloads = prepare(docs, profile)
+    q_full    = truncate(queries, FULL_DIMENSION)
+    q_reduced = truncate(queries, profile.dimension)
+    q_values  = quantize(q_reduced, profile.quantization) if profile.rescores else q_reduced
+
+    norms = np.linalg.norm(doc_values, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    first = (q_values @ (doc_values / norms).T)
+
+    shortlist = min(top_k * profile.oversample, docs.shape[0])
+    out = []
+    for qi in range(queries.shape[0]):
+        cand = np.argsort(-first[qi])[:shortlist]
+        if doc_payloads is not None:
+            matches = [{"idx": int(i), "rescore": doc_payloads[i]} for i in cand]
+            cand = [m["idx"] for m in rescore(q_full[qi], matches, top_k)]
+        out.append(list(cand[:top_k]))
+    return np.array(out)
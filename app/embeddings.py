@@ -1,7 +1,16 @@
-import os
-import requests
+import base64
+import time
 from typing import List
+
+import numpy as np
+import orjson
+import requests
+from urllib3.exceptions import ReadTimeoutError
+
 from app.config import settings
+from app.http_client import get_session
+from app.deadline import Deadline, DeadlineExceeded, exhausted, timeout_for
+from app.embedding_profiles import FULL_DIMENSION
 
 JINA_API_KEY = settings.JINA_API_KEY
 if not JINA_API_KEY:
@@ -14,25 +23,81 @@ JINA_HEADERS = {
 JINA_MODEL = "jina-embeddings-v3"
 JINA_TASK  = "retrieval.passage"
 
-def embed_texts(texts: List[str], task: str) -> List[List[float]]:
+EMBED_TIMEOUT = 30
+
+def _decode(item) -> np.ndarray:
+    """
+    One embedding from the response: a base64 string of little-endian
+    float32s (what we ask for), or a plain float list as a fallback.
+    """
+    if isinstance(item, str):
+        return np.frombuffer(base64.b64decode(item), dtype="<f4")
+    return np.asarray(item, dtype=np.float32)
+
+
+def _post(payload: dict, timeout: float) -> bytes:
+    """
+    POST to Jina with `timeout` bounding the whole exchange. requests' own
+    timeout only bounds each connect/read step, so a response that trickles
+    in is read in pieces against the clock.
+    """
+    stop = time.monotonic() + timeout
+    with get_session().post(JINA_URL, headers=JINA_HEADERS, json=payload,
+                            timeout=timeout, stream=True) as resp:
+        resp.raise_for_status()
+        body = bytearray()
+        try:
+            for part in resp.iter_content(64 * 1024):
+                body += part
+                if time.monotonic() > stop:
+                    raise requests.Timeout(f"Jina response took longer than {timeout:.1f}s")
+        except requests.ConnectionError as e:
+            # with stream=True, requests reports a read timeout in the body as a ConnectionError
+            if isinstance(e.args[0] if e.args else None, ReadTimeoutError):
+                raise requests.Timeout(str(e)) from e
+            raise
+    return bytes(body)
+
+
+def embed_texts(texts: List[str], task: str = JINA_TASK, deadline: Deadline = None,
+                dimensions: int = None) -> np.ndarray:
+    """
+    Embed `texts` with Jina and return a contiguous (len(texts), dim)
+    float32 matrix. Vectors travel as base64 float32 rather than JSON
+    floats, which keeps both the payload and the decode cheap. Vectors are
+    full-dimension unless `dimensions` asks for fewer; embedding profiles
+    truncate locally and keep the full vector for rescoring.
+    """
     payload = {
         "model": "jina-embeddings-v3",
         "task": task,
         "input": texts,
+        "embedding_type": "base64",
+        "dimensions": dimensions or FULL_DIMENSION,
     }
-    resp = requests.post(JINA_URL, headers=JINA_HEADERS, json=payload, timeout=30)
-    resp.raise_for_status()
-    body = resp.json()
+    try:
+        body = orjson.loads(_post(payload, timeout_for(deadline, EMBED_TIMEOUT)))
+    except (requests.Timeout, requests.ConnectionError) as e:
+        if exhausted(deadline):
+            raise DeadlineExceeded(f"request deadline of {deadline.budget:.1f}s exceeded") from e
+        raise
 
     if "data" in body and isinstance(body["data"], list):
-        embeddings = []
+        items = []
         for item in body["data"]:
             if not isinstance(item, dict) or "embedding" not in item:
                 raise RuntimeError(f"Unexpected item in Jina response: {item}")
-            embeddings.append(item["embedding"])
-        return embeddings
-
-    if "embeddings" in body and isinstance(body["embeddings"], list):
-        return body["embeddings"]
+            items.append(item["embedding"])
+    elif "embeddings" in body and isinstance(body["embeddings"], list):
+        items = body["embeddings"]
+    else:
+        raise RuntimeError(f"Unexpected Jina response format: {body}")
 
-    raise RuntimeError(f"Unexpected Jina response format: {body}")
+    if not items:
+        return np.empty((0, 0), dtype=np.float32)
+    first = _decode(items[0])
+    out = np.empty((len(items), first.shape[0]), dtype=np.float32)
+    out[0] = first
+    for i, item in enumerate(items[1:], start=1):
+        out[i] = _decode(item)
+    return out
@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+from pinecone.exceptions import NotFoundException
+
+from app.config import settings
+from app.s3_storage import _bucket, save_json, load_json, list_keys
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+# Per-request documents live in their own Pinecone namespace so they never
+# mix with the long-lived insurer corpora in the default namespace.
+NAMESPACE_PREFIX = "tmp-"
+REGISTRY_PREFIX  = "ephemeral/"
+
+
+def namespace_for(request_id: str) -> str:
+    return f"{NAMESPACE_PREFIX}{request_id}"
+
+
+def register(namespace: str, s3_keys: list[str], ttl: int = None) -> dict:
+    """
+    Record an ephemeral namespace (and the S3 objects backing it) so the
+    reaper can delete both once the TTL has passed.
+    """
+    now = time.time()
+    entry = {
+        "namespace":  namespace,
+        "s3_keys":    s3_keys,
+        "created_at": now,
+        "expires_at": now + (ttl or settings.EPHEMERAL_TTL_SECONDS),
+    }
+    save_json(f"{REGISTRY_PREFIX}{namespace}.json", entry)
+    return entry
+
+
+def is_expired(entry: dict, now: float = None) -> bool:
+    now = time.time() if now is None else now
+    return entry.get("expires_at", 0) <= now
+
+
+def delete_namespace(idx, entry: dict) -> None:
+    """
+    Drop the vectors, the S3 objects and finally the registry entry itself.
+    Any failure other than "namespace not found" propagates and leaves the
+    registry entry in place, so the next reaper pass retries.
+    """
+    ns = entry["namespace"]
+    try:
+        idx.delete(delete_all=True, namespace=ns)
+    except NotFoundException:
+        # a namespace that was never written (or already gone) is not an error
+        logger.info(f"[{ns}] namespace already gone")
+
+    for key in entry.get("s3_keys", []):
+        _bucket.Object(key).delete()
+    _bucket.Object(f"{REGISTRY_PREFIX}{ns}.json").delete()
+
+
+def reap_expired(idx, now: float = None) -> int:
+    """
+    Delete every registered namespace whose TTL has passed.
+    Returns the number of namespaces removed.
+    """
+    reaped = 0
+    for key in list_keys(REGISTRY_PREFIX):
+        entry = load_json(key)
+        if not entry or not is_expired(entry, now):
+            continue
+        try:
+            delete_namespace(idx, entry)
+        except Exception as e:
+            logger.warning(f"[{entry['namespace']}] reap failed, will retry: {e}")
+            continue
+        logger.info(f"[{entry['namespace']}] reaped expired namespace")
+        reaped += 1
+    return reaped
+
+
+async def run_reaper(idx, interval: int = None) -> None:
+    """
+    Background loop started from the app lifespan.
+    """
+    interval = interval or settings.EPHEMERAL_REAP_INTERVAL_SECONDS
+    while True:
+        try:
+            await asyncio.to_thread(reap_expired, idx)
+        except Exception as e:
+            logger.error(f"reaper error: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,147 @@
+# app/http_client.py
+import asyncio
+import socket
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import settings
+
+# One pooled client per flavour for the whole process: a sync
+# requests.Session for code that runs in worker threads (embeddings) and an
+# httpx.AsyncClient for the event loop (document downloads). Both keep
+# connections alive so repeated calls skip the TCP/TLS handshake.
+_lock = threading.Lock()
+_session: requests.Session = None
+_async_client: httpx.AsyncClient = None
+_host_slots: Dict[str, list] = {}    # host -> [semaphore, callers using it]
+
+
+def get_session() -> requests.Session:
+    global _session
+    with _lock:
+        if _session is None:
+            adapter = HTTPAdapter(
+                pool_connections=10,                          # distinct hosts kept warm
+                pool_maxsize=settings.HTTP_PER_HOST_LIMIT,   # urllib3 pools are per host
+                pool_block=True,
+            )
+            _session = requests.Session()
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            http2=settings.HTTP2,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            follow_redirects=True,
+        )
+    return _async_client
+
+
+@asynccontextmanager
+async def host_slot(url: str):
+    """
+    Cap concurrent requests to any one host on the shared async client
+    (httpx only limits the pool as a whole).
+    """
+    host = urlparse(url).netloc
+    slot = _host_slots.get(host)
+    if slot is None:
+        slot = _host_slots[host] = [asyncio.Semaphore(settings.HTTP_PER_HOST_LIMIT), 0]
+    slot[1] += 1
+    try:
+        async with slot[0]:
+            yield
+    finally:
+        # drop idle hosts so arbitrary document URLs don't grow this forever
+        slot[1] -= 1
+        if slot[1] == 0 and _host_slots.get(host) is slot:
+            del _host_slots[host]
+
+
+async def fetch(url: str, timeout: float = None) -> httpx.Response:
+    """
+    GET `url` on the shared client. `timeout` bounds the whole download,
+    not just each connect/read step (httpx's own timeout), so a body that
+    trickles in cannot run past it.
+    """
+    async with host_slot(url):
+        r = await asyncio.wait_for(get_async_client().get(url, timeout=timeout), timeout)
+    r.raise_for_status()
+    return r
+
+
+async def aclose() -> None:
+    global _async_client, _session
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+    _host_slots.clear()
+    uninstall_dns_cache()
+
+
+# ─── DNS cache ───────────────────────────────────────────────────────────────────
+# LRU of successful lookups, at most DNS_CACHE_SIZE entries. getaddrinfo
+# does not expose record TTLs, so entries expire after DNS_CACHE_TTL.
+_dns_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_dns_lock = threading.Lock()
+_replaced = None      # the resolver install_dns_cache() wraps, restored on uninstall
+
+
+def _cached_getaddrinfo(*args, **kwargs):
+    key = (args, tuple(sorted(kwargs.items())))
+    now = time.monotonic()
+    with _dns_lock:
+        hit = _dns_cache.get(key)
+        if hit and hit[0] > now:
+            _dns_cache.move_to_end(key)
+            return hit[1]
+    result = (_replaced or socket.getaddrinfo)(*args, **kwargs)
+    with _dns_lock:
+        _dns_cache[key] = (now + settings.DNS_CACHE_TTL, result)
+        _dns_cache.move_to_end(key)
+        while len(_dns_cache) > settings.DNS_CACHE_SIZE:
+            _dns_cache.popitem(last=False)
+    return result
+
+
+def install_dns_cache() -> None:
+    """
+    Cache name resolution process-wide for DNS_CACHE_TTL seconds, so new
+    connections (pool growth, S3, Pinecone, Jina) skip repeated lookups.
+    A TTL of 0 leaves resolution untouched. Undone by `aclose()`.
+    """
+    global _replaced
+    if settings.DNS_CACHE_TTL > 0 and settings.DNS_CACHE_SIZE > 0 \
+            and socket.getaddrinfo is not _cached_getaddrinfo:
+        _replaced = socket.getaddrinfo
+        socket.getaddrinfo = _cached_getaddrinfo
+
+
+def uninstall_dns_cache() -> None:
+    global _replaced
+    if socket.getaddrinfo is _cached_getaddrinfo and _replaced is not None:
+        socket.getaddrinfo = _replaced
+        _replaced = None
+    with _dns_lock:
+        _dns_cache.clear()
@@ -0,0 +1,250 @@
+# app/jobs.py
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+
+from app.config import settings
+from app.admission import current_tenant
+from app.schemas import MultiQuestionRequest
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+QUEUED    = "queued"
+RUNNING   = "running"
+SUCCEEDED = "succeeded"
+FAILED    = "failed"
+TERMINAL  = {SUCCEEDED, FAILED}
+
+Progress = Callable[[str, Optional[str]], None]
+Handler  = Callable[[dict, Progress], Awaitable[dict]]
+
+HANDLERS: Dict[str, Handler] = {}
+
+
+def handler(kind: str):
+    """
+    Register an async job handler: `async def fn(payload, progress) -> dict`.
+    """
+    def register(fn: Handler) -> Handler:
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+class JobStore:
+    """
+    SQLite-backed job table, so queued and running jobs survive a restart.
+    Safe to call from worker threads (`progress` is called from to_thread).
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id         TEXT PRIMARY KEY,
+                kind       TEXT NOT NULL,
+                status     TEXT NOT NULL,
+                payload    TEXT NOT NULL,
+                stages     TEXT NOT NULL,
+                result     TEXT,
+                error      TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                attempts   INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        columns = {r["name"] for r in self._db.execute("PRAGMA table_info(jobs)")}
+        if "attempts" not in columns:   # databases created before attempts were counted
+            self._db.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        self._db.commit()
+
+    def _row(self, row: sqlite3.Row) -> dict:
+        return {
+            "job_id":     row["id"],
+            "kind":       row["kind"],
+            "status":     row["status"],
+            "payload":    json.loads(row["payload"]),
+            "stages":     json.loads(row["stages"]),
+            "result":     json.loads(row["result"]) if row["result"] else None,
+            "error":      row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "attempts":   row["attempts"],
+        }
+
+    def create(self, kind: str, payload: dict) -> dict:
+        now = time.time()
+        job_id = uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, status, payload, stages, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(payload), "[]", now, now),
+            )
+            self._db.commit()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def update(self, job_id: str, **fields) -> None:
+        for key in ("stages", "result"):
+            if key in fields:
+                fields[key] = json.dumps(fields[key])
+        fields["updated_at"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+            self._db.commit()
+
+    def advance_stage(self, job_id: str, stage: Optional[str], detail: Optional[str] = None) -> None:
+        """
+        Close the running stage (if any) and open `stage`. `stage=None` just
+        closes the current one.
+        """
+        now = time.time()
+        stages = self.get(job_id)["stages"]
+        if stages and stages[-1]["status"] == RUNNING:
+            stages[-1].update(status=SUCCEEDED, finished_at=now)
+        if stage:
+            stages.append({"name": stage, "status": RUNNING, "detail": detail,
+                           "started_at": now, "finished_at": None})
+        self.update(job_id, stages=stages)
+
+    def unfinished(self) -> List[str]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (QUEUED, RUNNING),
+            ).fetchall()
+        return [r["id"] for r in rows]
+
+
+class JobRunner:
+    """
+    Bounded pool of asyncio workers pulling job IDs off a queue. Started and
+    stopped from the app lifespan; unfinished jobs are re-queued on start.
+    """
+
+    def __init__(self, store: JobStore, workers: int):
+        self.store = store
+        self.workers = workers
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        for job_id in self.store.unfinished():
+            attempts = self.store.get(job_id)["attempts"]
+            if attempts >= settings.JOB_MAX_ATTEMPTS:
+                # it was running each time the process died: don't crash-loop on it
+                logger.error(f"[job {job_id}] giving up after {attempts} attempts")
+                self.store.update(job_id, status=FAILED,
+                                  error=f"interrupted {attempts} times, not retried")
+                continue
+            self.store.update(job_id, status=QUEUED)
+            self._queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"job runner started with {self.workers} workers, {self._queue.qsize()} re-queued")
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, kind: str, payload: dict) -> dict:
+        if kind not in HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = self.store.create(kind, payload)
+        self._queue.put_nowait(job["job_id"])
+        return job
+
+    async def _worker(self) -> None:
+        # background work shares the admission pools as a tenant of its own
+        current_tenant.set("jobs")
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self.run_job(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def run_job(self, job_id: str) -> None:
+        job = self.store.get(job_id)
+        if job is None or job["status"] in TERMINAL:
+            return
+
+        self.store.update(job_id, status=RUNNING, stages=[], error=None, attempts=job["attempts"] + 1)
+
+        def progress(stage: str, detail: Optional[str] = None) -> None:
+            self.store.advance_stage(job_id, stage, detail)
+
+        try:
+            result = await HANDLERS[job["kind"]](job["payload"], progress)
+        except asyncio.CancelledError:
+            # shutting down: leave it RUNNING so the next start re-queues it
+            raise
+        except Exception as e:
+            logger.error(f"[job {job_id}] {job['kind']} failed: {e}")
+            stages = self.store.get(job_id)["stages"]
+            if stages and stages[-1]["status"] == RUNNING:
+                stages[-1].update(status=FAILED, finished_at=time.time())
+            self.store.update(job_id, status=FAILED, stages=stages, error=str(e))
+        else:
+            self.store.advance_stage(job_id, None)
+            self.store.update(job_id, status=SUCCEEDED, result=result)
+            logger.info(f"[job {job_id}] {job['kind']} succeeded")
+
+
+store  = JobStore(settings.JOBS_DB_PATH)
+runner = JobRunner(store, settings.JOB_WORKERS)
+
+
+# ─── handlers ────────────────────────────────────────────────────────────────────
+
+@handler("upload")
+async def _upload_job(payload: dict, progress: Progress) -> dict:
+    from app.pipeline import index_file
+
+    count = await index_file(Path(payload["path"]), payload["filename"], progress)
+    return {"filename": payload["filename"], "indexed_chunks": count}
+
+
+@handler("ingest")
+async def _ingest_job(payload: dict, progress: Progress) -> dict:
+    from scripts.index_documents import arun as index_run
+
+    count = await index_run(lambda name: progress("index", name))
+    return {"indexed_chunks": count}
+
+
+@handler("hackrx_run")
+async def _hackrx_job(payload: dict, progress: Progress) -> dict:
+    from app.pipeline import (
+        load_all, ingest_all, combined_text, answer_questions, fits_in_context, answer_direct,
+    )
+
+    request_id = uuid4().hex
+    urls = MultiQuestionRequest(**payload).document_urls()
+    progress("download", ", ".join(urls))
+    docs = await load_all(urls, request_id)
+    text = combined_text(docs)
+    if fits_in_context(text):
+        progress("answer", f"{len(payload['questions'])} questions, whole document")
+        return {"answers": await answer_direct(text, payload["questions"], request_id)}
+    progress("ingest", f"{len(docs)} document(s)")
+    namespaces = await ingest_all(docs, request_id)
+    progress("answer", f"{len(payload['questions'])} questions")
+    answers = await answer_questions(payload["questions"], namespaces, request_id)
+    return {"answers": answers}
@@ -1,12 +1,20 @@
+import asyncio
 import json
 import re
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List
 
+from google import genai
+from google.genai import types as genai_types
 from langchain_google_genai import ChatGoogleGenerativeAI
 from app.config import settings
 
+GEMINI_MODEL = "gemini-2.5-flash"
+
 # Initialize Gemini
-gemini_llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", api_key=settings.GEMINI_API_KEY)
+gemini_llm = ChatGoogleGenerativeAI(model=GEMINI_MODEL, api_key=settings.GEMINI_API_KEY)
+
+# Raw client, for features LangChain doesn't expose (context caching)
+genai_client = genai.Client(api_key=settings.GEMINI_API_KEY)
 
 
 def _extract_text(response) -> str:
@@ -76,15 +84,9 @@ Return *only* a JSON object.
     return _parse_json(text)
 
 
-def synthesize_answer(natural: str, clauses: List[Dict]) -> Dict:
+def build_synthesis_prompt(natural: str, clauses: List[Dict]) -> str:
     """
-    Given the original query and a list of retrieved clauses, produce
-    a decision JSON with approval/rejection, amount, and justifications.
-    Each justification must include:
-      - clause_id
-      - snippet (short extract)
-      - full_text (complete clause text)
-      - explanation (LLM’s reasoning in plain English)
+    Prompt asking for a decision JSON over the retrieved clauses.
     """
     contexts = "\n---\n".join(
         f"ID: {c['id']}\nFullText: {c['text']}"
@@ -114,6 +116,20 @@ Do NOT include any other keys or commentary. Return STRICTLY valid JSON.
 Relevant Clauses:
 {contexts}
 """
+    return prompt
+
+
+def synthesize_answer(natural: str, clauses: List[Dict]) -> Dict:
+    """
+    Given the original query and a list of retrieved clauses, produce
+    a decision JSON with approval/rejection, amount, and justifications.
+    Each justification must include:
+      - clause_id
+      - snippet (short extract)
+      - full_text (complete clause text)
+      - explanation (LLM’s reasoning in plain English)
+    """
+    prompt = build_synthesis_prompt(natural, clauses)
     raw  = gemini_llm.invoke(prompt)
     text = _extract_text(raw)
     return _parse_json(text)
@@ -125,3 +141,57 @@ def chat_general(user_input: str) -> str:
     """
     raw = gemini_llm.invoke(user_input)
     return _extract_text(raw)
+
+
+async def achat_general(user_input: str, timeout: float = None) -> str:
+    """
+    Async `chat_general`; raises asyncio.TimeoutError after `timeout` seconds.
+    """
+    raw = await asyncio.wait_for(gemini_llm.ainvoke(user_input), timeout)
+    return _extract_text(raw)
+
+
+async def stream_general(user_input: str) -> AsyncIterator[str]:
+    """
+    Streaming variant of `chat_general`: yields text chunks as Gemini
+    produces them.
+    """
+    async for chunk in gemini_llm.astream(user_input):
+        text = _extract_text(chunk)
+        if text:
+            yield text
+
+
+async def create_context_cache(document: str, system_instruction: str, ttl_seconds: int = 600) -> str:
+    """
+    Cache a document prefix on Gemini's side so several prompts can reuse it
+    without resending it. Returns the cache name.
+    """
+    cache = await genai_client.aio.caches.create(
+        model=GEMINI_MODEL,
+        config=genai_types.CreateCachedContentConfig(
+            contents=[document],
+            system_instruction=system_instruction,
+            ttl=f"{ttl_seconds}s",
+        ),
+    )
+    return cache.name
+
+
+async def achat_cached(user_input: str, cache_name: str, timeout: float = None) -> str:
+    """
+    `achat_general` against a cached prefix from `create_context_cache`.
+    """
+    resp = await asyncio.wait_for(
+        genai_client.aio.models.generate_content(
+            model=GEMINI_MODEL,
+            contents=user_input,
+            config=genai_types.GenerateContentConfig(cached_content=cache_name),
+        ),
+        timeout,
+    )
+    return _extract_text(resp)
+
+
+async def delete_context_cache(cache_name: str) -> None:
+    await genai_client.aio.caches.delete(name=cache_name)
@@ -1,13 +1,15 @@
 # app/main.py
 import json
 import asyncio
+from typing import AsyncIterator, Optional
+from contextlib import asynccontextmanager, suppress
 from uuid import uuid4
-from tempfile import NamedTemporaryFile
 from pathlib import Path
 
-import httpx
 from fastapi import (
     FastAPI,
+    Query,
+    Header,
     Depends,
     HTTPException,
     status,
@@ -15,7 +17,7 @@ from fastapi import (
     File,
     UploadFile,
 )
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -25,19 +27,72 @@ from app.schemas import (
     GeneralResponse,
     MultiQuestionRequest,
     AnswerResponse,
+    JobResponse,
+)
+from app.llm import (
+    structure_query,
+    synthesize_answer,
+    build_synthesis_prompt,
+    chat_general,
+    stream_general,
+    _parse_json,
 )
-from app.llm import structure_query, synthesize_answer, chat_general
 from app.retriever import retrieve
-from app.s3_storage import _bucket, save_json
-from app.docs_loader import load_document
-from app.chunking import chunk_text
-from app.embeddings import embed_texts
+from app.s3_storage import save_json
 from app.pinecone_client import get_index
+from app.ephemeral import run_reaper
+from app import http_client, admission
+from app.admission import AdmissionRejected, current_tenant
+from app.deadline import Deadline, DeadlineExceeded, DEADLINE_HEADER
+from app.jobs import runner as job_runner, store as job_store, TERMINAL
+from app.sse import format_event
+from app.pipeline import (
+    load_all,
+    ingest_all,
+    combined_text,
+    answer_questions,
+    iter_answers,
+    stream_answer,
+    index_file,
+    fits_in_context,
+    answer_direct,
+    iter_direct_answers,
+    stream_direct_answer,
+    LLM_TIMEOUT,
+    DocumentFetchError,
+    DocumentStoreError,
+)
 from app.utils import get_logger
 
 logger = get_logger(__name__)
 
-app = FastAPI(title="HackRx Policy Q&R")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    http_client.install_dns_cache()
+    reaper = asyncio.create_task(run_reaper(get_index()))
+    await job_runner.start()
+    try:
+        yield
+    finally:
+        await job_runner.stop()
+        reaper.cancel()
+        with suppress(asyncio.CancelledError):
+            await reaper
+        await http_client.aclose()
+
+app = FastAPI(title="HackRx Policy Q&R", lifespan=lifespan)
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded(request, exc: DeadlineExceeded):
+    return JSONResponse(status_code=status.HTTP_504_GATEWAY_TIMEOUT, content={"detail": str(exc)})
 
 # ─── CORS ───────────────────────────────────────────────────────────────────────
 app.add_middleware(
@@ -60,53 +115,144 @@ def verify_bearer_token(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or missing bearer token"
         )
+    return credentials.credentials
 
-# ─── /query endpoint (unchanged) ────────────────────────────────────────────────
+# ─── /query endpoint ────────────────────────────────────────────────────────────
 @app.post("/query")
-async def query_endpoint(req: QueryRequest):
+async def query_endpoint(
+    req: QueryRequest,
+    stream: bool = Query(False, description="Stream LLM tokens as server-sent events"),
+    deadline_ms: Optional[str] = Header(None, alias=DEADLINE_HEADER),
+):
     req.request_id = req.request_id or uuid4().hex
-    insurer = req.insurer
+    insurer  = req.insurer
+    deadline = Deadline.from_header(deadline_ms)
+    if stream:
+        return await _event_stream(_query_events(req, deadline))
 
-    params = structure_query(req.query)
+    params = await _llm_call(deadline, structure_query, req.query)
     missing = sum(1 for v in params.values() if not v)
     if missing > 2:
-        return await _fallback(req, insurer)
+        return await _fallback(req, insurer, deadline)
 
     combined = " ".join(str(v) for v in params.values() if v)
-    clauses  = retrieve(combined, top_k=5, insurer=insurer)
+    clauses  = await admission.run_in_thread("embed", retrieve, combined, 5, insurer, deadline=deadline)
     if not clauses:
-        return await _fallback(req, insurer)
+        return await _fallback(req, insurer, deadline)
 
-    structured = synthesize_answer(req.query, clauses)
+    structured = await _llm_call(deadline, synthesize_answer, req.query, clauses)
     response   = QueryResponse(**structured)
 
-    save_json(f"logs/{req.request_id}.json", {
-        "request_id": req.request_id,
-        "query":       req.query,
-        "response":    response.dict(),
-    })
+    _save_query_log(req, response)
     return response
 
-async def _fallback(req: QueryRequest, insurer: str):
+async def _llm_call(deadline: Deadline, fn, *args):
+    """
+    Run a blocking Gemini helper under the llm admission pool, giving up
+    (504) once the request's deadline has passed.
+    """
+    try:
+        return await asyncio.wait_for(
+            admission.run_in_thread("llm", fn, *args),
+            deadline.timeout(LLM_TIMEOUT),
+        )
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"request deadline of {deadline.budget:.1f}s exceeded")
+
+async def _fallback(req: QueryRequest, insurer: str, deadline: Deadline):
     logger.info(f"[{req.request_id}] falling back to general chat")
-    contexts = retrieve(req.query, top_k=50, insurer=insurer)
+    # the fallback casts a wide net; keep it narrower when time is short
+    top_k    = 10 if deadline.low() else 50
+    contexts = await admission.run_in_thread("embed", retrieve, req.query, top_k, insurer, deadline=deadline)
+    answer   = await _llm_call(deadline, chat_general, _fallback_prompt(req.query, contexts))
+    resp   = GeneralResponse(answer=answer)
+    _save_query_log(req, resp)
+    return JSONResponse(status_code=200, content=resp.dict())
+
+def _fallback_prompt(query: str, contexts: list) -> str:
     context_str = "\n---\n".join(
         f"{c['source']} ({c['id']}): {c['text'][:500]}…"
         for c in contexts
     )
-    prompt = (
+    return (
         "Use the following context snippets to answer the question:\n"
         f"{context_str}\n\n"
-        f"Question: {req.query}"
+        f"Question: {query}"
     )
-    answer = chat_general(prompt)
-    resp   = GeneralResponse(answer=answer)
+
+def _save_query_log(req: QueryRequest, resp) -> None:
     save_json(f"logs/{req.request_id}.json", {
         "request_id": req.request_id,
         "query":       req.query,
         "response":    resp.dict(),
     })
-    return JSONResponse(status_code=200, content=resp.dict())
+
+async def _event_stream(events: AsyncIterator[str]) -> StreamingResponse:
+    """
+    Wrap an SSE generator, running it up to its first event before the
+    response starts: being rejected by admission control then is still a
+    503 with Retry-After rather than an `error` event in a 200 stream.
+    Later rejections become an `error` event carrying `retry_after`.
+    """
+    try:
+        first = await events.__anext__()
+    except StopAsyncIteration:
+        first = None
+
+    async def body():
+        if first is not None:
+            yield first
+        try:
+            async for event in events:
+                yield event
+        except AdmissionRejected as e:
+            yield format_event("error", {"detail": str(e), "retry_after": e.retry_after})
+
+    return StreamingResponse(body(), media_type="text/event-stream")
+
+async def _query_events(req: QueryRequest, deadline: Deadline):
+    """
+    Streaming /query: `token` events while the LLM writes, then one
+    `result` event with the same body the JSON endpoint would return.
+    """
+    try:
+        params  = await _llm_call(deadline, structure_query, req.query)
+        missing = sum(1 for v in params.values() if not v)
+        clauses = []
+        if missing <= 2:
+            combined = " ".join(str(v) for v in params.values() if v)
+            clauses  = await admission.run_in_thread(
+                "embed", retrieve, combined, 5, req.insurer, deadline=deadline,
+            )
+
+        if clauses:
+            prompt = build_synthesis_prompt(req.query, clauses)
+        else:
+            logger.info(f"[{req.request_id}] falling back to general chat")
+            top_k    = 10 if deadline.low() else 50
+            contexts = await admission.run_in_thread(
+                "embed", retrieve, req.query, top_k, req.insurer, deadline=deadline,
+            )
+            prompt   = _fallback_prompt(req.query, contexts)
+
+        parts = []
+        async with admission.slot("llm"):
+            async for token in stream_general(prompt):
+                parts.append(token)
+                yield format_event("token", {"text": token})
+                if deadline.expired():
+                    raise DeadlineExceeded(f"request deadline of {deadline.budget:.1f}s exceeded")
+
+        text = "".join(parts)
+        resp = QueryResponse(**_parse_json(text)) if clauses else GeneralResponse(answer=text)
+        await asyncio.to_thread(_save_query_log, req, resp)
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.error(f"[{req.request_id}] streaming query failed: {e}")
+        yield format_event("error", {"detail": str(e)})
+        return
+    yield format_event("result", resp.dict())
 
 # ─── /upload endpoint (unchanged) ───────────────────────────────────────────────
 @app.post("/upload", status_code=201)
@@ -119,38 +265,24 @@ async def upload_document(file: UploadFile = File(...)):
     path.write_bytes(content)
     logger.info(f"Saved uploaded file: {path}")
 
-    text   = load_document(path)
-    chunks = chunk_text(text)
-    vectors = embed_texts(chunks)
-    idx = get_index()
-    batch = [
-        (f"{path.stem}-{i}", vec, {
-            "source": file.filename,
-            "insurer": path.stem,
-            "text": chunk,
-        })
-        for i, (vec, chunk) in enumerate(zip(vectors, chunks))
-    ]
-    idx.upsert(vectors=batch)
-    logger.info(f"Indexed {len(batch)} chunks from {file.filename}")
-
-    return {"filename": file.filename, "indexed_chunks": len(batch)}
-
-# ─── /ingest endpoint (unchanged) ───────────────────────────────────────────────
+    count = await index_file(path, file.filename)
+
+    return {"filename": file.filename, "indexed_chunks": count}
+
+# ─── /ingest endpoint ───────────────────────────────────────────────────────────
 @app.post("/ingest")
 async def ingest_endpoint():
-    from scripts.index_documents import run as index_run
-    count = index_run()
+    from scripts.index_documents import arun as index_run
+    count = await index_run()
     return {"indexed_chunks": count}
 
 # ─── /hackrx/run endpoint (JSON only + Bearer + URL download) ────────────────────
 @app.post(
     "/hackrx/run",
     response_model=AnswerResponse,
-    summary="Run a multi-question query on a single document URL",
-    dependencies=[Depends(verify_bearer_token)],
+    summary="Run a multi-question query on one or more document URLs",
 )
-async def run(req: MultiQuestionRequest = Body(
+async def run(token: str = Depends(verify_bearer_token), req: MultiQuestionRequest = Body(
     ...,
     example={
       "documents": "https://hackrx.blob.core.windows.net/assets/policy.pdf?sv=…",
@@ -160,84 +292,151 @@ async def run(req: MultiQuestionRequest = Body(
         # …
       ]
     }
-)):
+), stream: bool = Query(False, description="Stream each answer as a server-sent event"),
+   deadline_ms: Optional[str] = Header(None, alias=DEADLINE_HEADER)):
     request_id = uuid4().hex
+    current_tenant.set(token)
+    deadline = Deadline.from_header(deadline_ms)
 
-    # 1) Download PDF (async)
+    # 1) Download & extract every document concurrently (shared with
+    #    concurrent calls for the same URL)
     try:
-        async with httpx.AsyncClient(timeout=60) as client:
-            r = await client.get(req.documents, follow_redirects=True)
-            r.raise_for_status()
-        pdf_bytes = r.content
-        logger.info(f"[{request_id}] downloaded {len(pdf_bytes)} bytes")
-    except Exception as e:
-        logger.error(f"[{request_id}] download error: {e}")
+        docs = await load_all(req.document_urls(), request_id, deadline)
+    except DocumentFetchError as e:
         raise HTTPException(400, f"Failed to fetch document: {e}")
 
-    # 2) Upload PDF to S3 (offloaded)
-    s3_key = f"documents/{request_id}.pdf"
+    # 2a) Small documents: answer from the whole text, no embedding or retrieval
+    text = combined_text(docs)
+    if fits_in_context(text):
+        logger.info(f"[{request_id}] {len(docs)} document(s) fit in context, answering directly")
+        if stream:
+            return await _event_stream(_direct_events(text, req.questions, request_id, deadline))
+        answers = await answer_direct(text, req.questions, request_id, deadline)
+        return JSONResponse(
+            status_code=200,
+            content=AnswerResponse(answers=answers).dict()
+        )
+
+    # 2b) Store, embed & upsert each document (shared with concurrent calls
+    #     for the same content)
     try:
-        await asyncio.to_thread(_bucket.put_object, Key=s3_key, Body=pdf_bytes)
-        logger.info(f"[{request_id}] uploaded PDF to S3 at {s3_key}")
-    except Exception as e:
-        logger.error(f"[{request_id}] S3 upload error: {e}")
-        raise HTTPException(500, "Failed to push PDF to S3")
-
-    # 3) Extract & chunk (offloaded)
-    with NamedTemporaryFile(suffix=".pdf") as tmpf:
-        tmpf.write(pdf_bytes)
-        tmpf.flush()
-        text   = await asyncio.to_thread(load_document, Path(tmpf.name))
-        chunks = await asyncio.to_thread(chunk_text, text)
-
-    # 4) Embed & upsert to Pinecone (offloaded)
-    vectors = await asyncio.to_thread(embed_texts, chunks)
-    idx     = get_index()
-    batch   = [
-        (f"{request_id}-{i}", vec, {"source": s3_key, "insurer": request_id, "text": chunk})
-        for i, (vec, chunk) in enumerate(zip(vectors, chunks))
-    ]
-    await asyncio.to_thread(idx.upsert, vectors=batch)
-    logger.info(f"[{request_id}] upserted {len(batch)} chunks")
-
-    # 5) Answer each question (2 concurrent LLM calls)
-    sem = asyncio.Semaphore(2)
-
-    async def answer_one(q: str) -> str:
-        async with sem:
-            # retrieve (offload if blocking)
-            ctxs = await asyncio.to_thread(retrieve, q, 10, request_id)
-            context_str = "\n---\n".join(f"{c['source']}: {c['text']}…" for c in ctxs)
-
-            prompt = f"""
-You are a meticulous and detail-oriented insurance policy analyst. Your task is to answer the user's question with maximum precision and completeness, based *only* on the provided context snippets.
-
-Follow these instructions exactly:
-1.  **Analyze the Context:** Carefully read all the provided context snippets to find the most relevant clauses that answer the user's question.
-2.  **Extract All Details:** From the relevant clauses, you must extract every key detail. Pay close attention to the following, and list them if they are present:
-    * **Conditions and Eligibility:** What are the specific requirements, waiting periods, age limits, or pre-requisites?
-    * **Limits and Sub-limits:** Are there any monetary caps, percentage-based limits, or limits on frequency (e.g., "up to 2 deliveries")?
-    * **Specific Criteria:** For definitions (like "Hospital"), what are all the specific criteria listed (e.g., bed count, staff requirements, facilities)?
-    * **Type of Coverage:** Is the coverage for "in-patient," "out-patient," "day care," etc.?
-3.  **Synthesize the Answer:**
-    * Start with a direct, one-sentence answer (e.g., "Yes, this is covered," "No, this is excluded," "The waiting period is X months.").
-    * Answer should be at max 2 lines. 1st Line should have the answer yes/no and the duration or any other important detail. 2nd Line should have details if necessary.
-    * Do no formatting, just plain text. 
-4.  **Handle Missing Information:** If a specific detail is not mentioned in the context, you must explicitly state that (e.g., "* The context does not specify the maximum number of deliveries.").
-
----
-CONTEXT:
-{context_str}
----
-QUESTION: {q}
-
-ANSWER:
-"""
-            # LLM call (offloaded)
-            return await asyncio.to_thread(chat_general, prompt)
-
-    answers = await asyncio.gather(*(answer_one(q) for q in req.questions))
+        namespaces = await ingest_all(docs, request_id, deadline)
+    except DocumentStoreError as e:
+        raise HTTPException(500, str(e))
+
+    # 3) Answer each question across all documents (2 concurrent LLM calls)
+    if stream:
+        return await _event_stream(_run_events(req.questions, namespaces, request_id, deadline))
+    answers = await answer_questions(req.questions, namespaces, request_id, deadline=deadline)
     return JSONResponse(
         status_code=200,
         content=AnswerResponse(answers=answers).dict()
     )
+
+async def _direct_events(document: str, questions: list, request_id: str, deadline: Deadline):
+    """
+    `_run_events` for direct-context answers: the same event shape, with
+    `token`s for a single question.
+    """
+    answers = [None] * len(questions)
+    try:
+        if len(questions) == 1:
+            parts = []
+            async for token in stream_direct_answer(document, questions[0], deadline):
+                parts.append(token)
+                yield format_event("token", {"index": 0, "text": token})
+            answers[0] = "".join(parts)
+            yield format_event("answer", {"index": 0, "answer": answers[0]})
+        else:
+            async for i, answer in iter_direct_answers(document, questions, request_id, deadline):
+                answers[i] = answer
+                yield format_event("answer", {"index": i, "answer": answer})
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.error(f"[{request_id}] streaming direct answers failed: {e}")
+        yield format_event("error", {"detail": str(e)})
+        return
+    yield format_event("done", AnswerResponse(answers=answers).dict())
+
+async def _run_events(questions: list, namespace: list, request_id: str, deadline: Deadline):
+    """
+    Streaming /hackrx/run: one `answer` event per question as soon as it is
+    ready (tagged with its index), then a final `done` event with all
+    answers in order. A single question also streams its LLM `token`s.
+    """
+    answers = [None] * len(questions)
+    try:
+        if len(questions) == 1:
+            parts = []
+            async for token in stream_answer(questions[0], namespace, deadline):
+                parts.append(token)
+                yield format_event("token", {"index": 0, "text": token})
+            answers[0] = "".join(parts)
+            yield format_event("answer", {"index": 0, "answer": answers[0]})
+        else:
+            async for i, answer in iter_answers(questions, namespace, request_id, deadline=deadline):
+                answers[i] = answer
+                yield format_event("answer", {"index": i, "answer": answer})
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.error(f"[{request_id}] streaming answers failed: {e}")
+        yield format_event("error", {"detail": str(e)})
+        return
+    yield format_event("done", AnswerResponse(answers=answers).dict())
+
+# ─── /jobs endpoints (async ingest: return a job ID, run in the worker pool) ─────
+def _job_or_404(job_id: str) -> dict:
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(404, f"Unknown job: {job_id}")
+    return job
+
+@app.post("/jobs/upload", status_code=202, response_model=JobResponse)
+async def upload_job(file: UploadFile = File(...)):
+    docs_dir = Path("data/docs")
+    docs_dir.mkdir(exist_ok=True, parents=True)
+
+    path = docs_dir / file.filename
+    path.write_bytes(await file.read())
+    logger.info(f"Saved uploaded file: {path}")
+    return job_runner.submit("upload", {"path": str(path), "filename": file.filename})
+
+@app.post("/jobs/ingest", status_code=202, response_model=JobResponse)
+async def ingest_job():
+    return job_runner.submit("ingest", {})
+
+@app.post(
+    "/jobs/hackrx/run",
+    status_code=202,
+    response_model=JobResponse,
+    dependencies=[Depends(verify_bearer_token)],
+)
+async def run_job(req: MultiQuestionRequest):
+    return job_runner.submit("hackrx_run", req.dict())
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    return _job_or_404(job_id)
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-sent events: one `job` event per state change, ending once the
+    job has succeeded or failed.
+    """
+    _job_or_404(job_id)
+
+    async def events():
+        last = None
+        while True:
+            job = job_store.get(job_id)
+            if job["updated_at"] != last:
+                last = job["updated_at"]
+                yield format_event("job", JobResponse(**job).dict())
+            if job["status"] in TERMINAL:
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
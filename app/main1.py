@@ -25,6 +25,7 @@ from app.docs_loader import load_document
 from app.chunking import chunk_text
 from app.embeddings import embed_texts
 from app.pinecone_client import get_index
+from app.ephemeral import namespace_for, register
 from app.utils import get_logger
 
 logger = get_logger(__name__)
@@ -89,23 +90,25 @@ async def run(req: MultiQuestionRequest = Body(
         text   = await asyncio.to_thread(load_document, Path(tmpf.name))
         chunks = await asyncio.to_thread(chunk_text, text)
 
+    namespace = namespace_for(request_id)
     vectors = await asyncio.to_thread(embed_texts, chunks, task="retrieval.passage")
     idx     = get_index()
     
     try:
         initial_stats = await asyncio.to_thread(idx.describe_index_stats)
-        initial_vector_count = initial_stats.get("total_vector_count", 0)
+        initial_vector_count = initial_stats.get("namespaces", {}).get(namespace, {}).get("vector_count", 0)
     except Exception as e:
         logger.warning(f"Could not get initial index stats: {e}. Defaulting count to 0.")
         initial_vector_count = 0
 
     # 2. Upsert the new vectors
     batch   = [
-        (f"{request_id}-{i}", vec, {"source": s3_key, "insurer": request_id, "text": chunk})
+        (f"{request_id}-{i}", vec.tolist(), {"source": s3_key, "insurer": request_id, "text": chunk})
         for i, (vec, chunk) in enumerate(zip(vectors, chunks))
     ]
-    await asyncio.to_thread(idx.upsert, vectors=batch)
-    logger.info(f"[{request_id}] upserted {len(batch)} chunks")
+    await asyncio.to_thread(idx.upsert, vectors=batch, namespace=namespace)
+    await asyncio.to_thread(register, namespace, [s3_key])
+    logger.info(f"[{request_id}] upserted {len(batch)} chunks into {namespace}")
 
     # 3. Poll the index until the vector count is updated
     expected_count = initial_vector_count + len(batch)
@@ -117,7 +120,7 @@ async def run(req: MultiQuestionRequest = Body(
     while (time.monotonic() - start_time) < timeout_seconds:
         try:
             stats = await asyncio.to_thread(idx.describe_index_stats)
-            current_count = stats.get("total_vector_count", 0)
+            current_count = stats.get("namespaces", {}).get(namespace, {}).get("vector_count", 0)
             if current_count >= expected_count:
                 logger.info(f"[{request_id}] Index is ready with {current_count} vectors.")
                 break
@@ -134,7 +137,7 @@ async def run(req: MultiQuestionRequest = Body(
 
     async def answer_one(q: str) -> str:
         async with sem:
-            ctxs = await asyncio.to_thread(retrieve, q, 5, request_id)
+            ctxs = await asyncio.to_thread(retrieve, q, 5, namespace=namespace)
             context_str = "\n---\n".join(f"{c['source']}: {c['text']}…" for c in ctxs)
 
         prompt = f"""
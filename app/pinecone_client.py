@@ -1,19 +1,52 @@
 from pinecone import Pinecone, ServerlessSpec
 from app.config import settings
+from app.embedding_profiles import EmbeddingProfile, get_profile, prepare
 
 pc = Pinecone(api_key=settings.PINECONE_API_KEY)
 INDEX_NAME = "policy-retrieval"
+UPSERT_BATCH = 100
+_indexes = {}
 
-def get_index():
-    if not pc.has_index(INDEX_NAME):
-        pc.create_index(
-            name=INDEX_NAME,
-            vector_type="dense",
-            dimension=1024,
-            metric="cosine",
-            spec=ServerlessSpec(cloud="aws", region=settings.PINECONE_ENV),
-            deletion_protection="disabled",
-        )
-    return pc.Index(INDEX_NAME)
+def index_name(profile: EmbeddingProfile) -> str:
+    # the baseline keeps the original index; other profiles get their own
+    return INDEX_NAME if profile.name == "full" else f"{INDEX_NAME}-{profile.name}"
+
+def get_index(profile: EmbeddingProfile = None):
+    """
+    The profile's index, created on first use and then reused, so importing
+    this module does not talk to Pinecone.
+    """
+    profile = profile or get_profile()
+    name = index_name(profile)
+    if name not in _indexes:
+        if not pc.has_index(name):
+            pc.create_index(
+                name=name,
+                vector_type="dense",
+                dimension=profile.dimension,
+                metric="cosine",
+                spec=ServerlessSpec(cloud="aws", region=settings.PINECONE_ENV),
+                deletion_protection="disabled",
+            )
+        _indexes[name] = pc.Index(name)
+    return _indexes[name]
+
+def upsert_vectors(idx, ids: list, vectors, metadatas: list, namespace: str = None,
+                   batch_size: int = UPSERT_BATCH, profile: EmbeddingProfile = None) -> int:
+    """
+    Upsert rows of a float32 matrix in batches. Vectors are reduced and
+    quantized for the active embedding profile (with a compact rescore
+    copy in metadata), and become Python lists only here, one batch at a
+    time, because the Pinecone client needs lists.
+    """
+    values, rescore = prepare(vectors, profile or get_profile())
+    for start in range(0, len(ids), batch_size):
+        stop = min(start + batch_size, len(ids))
+        batch = [
+            (ids[i], values[i].tolist(),
+             dict(metadatas[i], rescore=rescore[i]) if rescore else metadatas[i])
+            for i in range(start, stop)
+        ]
+        idx.upsert(vectors=batch, namespace=namespace)
+    return len(ids)
 
-index = get_index()
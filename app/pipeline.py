@@ -0,0 +1,664 @@
+# app/pipeline.py
+import asyncio
+import hashlib
+import re
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from tempfile import NamedTemporaryFile
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, List, Tuple, Union
+from uuid import uuid4
+
+import numpy as np
+
+from app.s3_storage import _bucket, ConditionalWriteFailed
+from app.docs_loader import load_document
+from app.chunking import chunk_text
+from app.embeddings import embed_texts
+from app.pinecone_client import get_index, index_name, upsert_vectors
+from app.embedding_profiles import get_profile, decode_rescore
+from app.retriever import retrieve, retrieve_many
+from app.llm import (
+    achat_general,
+    achat_cached,
+    stream_general,
+    create_context_cache,
+    delete_context_cache,
+    _parse_json,
+)
+from app.ephemeral import namespace_for, register
+from app.dedup import ChunkRegistry, registry_key
+from app.singleflight import SingleFlight
+from app.http_client import fetch
+from app import admission
+from app.admission import AdmissionRejected
+from app.deadline import Deadline, DeadlineExceeded, timeout_for, is_low
+from app.config import settings
+from app.utils import get_logger, estimate_tokens
+
+logger = get_logger(__name__)
+
+# Concurrent /hackrx/run calls for the same document share one download
+# (keyed by URL) and one ingest (keyed by content hash).
+_load_flight   = SingleFlight()
+_ingest_flight = SingleFlight()
+
+# serialises corpus indexing in this process; other writers are caught by
+# the registry's conditional save, which triggers a reload
+_registry_lock = asyncio.Lock()
+_registries: Dict[str, ChunkRegistry] = {}   # registry key -> last saved copy
+REGISTRY_ATTEMPTS   = 3
+LEGACY_DELETE_BATCH = 1000
+FETCH_BATCH         = 100
+
+# one namespace, or several for multi-document requests
+Namespaces = Union[str, List[str]]
+
+INDEX_WAIT_SECONDS = 5
+DOWNLOAD_TIMEOUT   = 60
+LLM_TIMEOUT        = 60
+TIMEOUT_ANSWER     = "The answer could not be produced within the time limit."
+
+
+class DocumentFetchError(RuntimeError):
+    pass
+
+
+class DocumentStoreError(RuntimeError):
+    pass
+
+
+@dataclass
+class LoadedDocument:
+    url: str
+    content: bytes
+    text: str
+    sha256: str
+
+
+@dataclass
+class IngestedDocument:
+    namespace: str
+    s3_key: str
+    chunk_count: int
+
+
+async def _shared(flight: SingleFlight, key: str, deadline: Deadline, fn, *args):
+    """
+    Join (or start) the shared `fn(*args)` for `key`. The shared work runs
+    without any one caller's deadline; each caller stops waiting at its own
+    deadline, which only cancels the work if nobody else is waiting on it.
+    """
+    if deadline is None:
+        return await flight.do(key, fn, *args)
+    timeout = deadline.timeout(float("inf"))
+    try:
+        return await asyncio.wait_for(flight.do(key, fn, *args), timeout)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"request deadline of {deadline.budget:.1f}s exceeded")
+
+
+async def _load(url: str, request_id: str) -> LoadedDocument:
+    try:
+        async with admission.slot("download"):
+            r = await fetch(url, timeout=DOWNLOAD_TIMEOUT)
+        content = r.content
+        logger.info(f"[{request_id}] downloaded {len(content)} bytes")
+    except (AdmissionRejected, DeadlineExceeded):
+        raise
+    except Exception as e:
+        logger.error(f"[{request_id}] download error: {e}")
+        raise DocumentFetchError(str(e)) from e
+
+    with NamedTemporaryFile(suffix=".pdf") as tmpf:
+        tmpf.write(content)
+        tmpf.flush()
+        text = await admission.run_in_thread("parse", load_document, Path(tmpf.name))
+
+    return LoadedDocument(
+        url=url,
+        content=content,
+        text=text,
+        sha256=hashlib.sha256(content).hexdigest(),
+    )
+
+
+async def load_remote(url: str, request_id: str, deadline: Deadline = None) -> LoadedDocument:
+    """
+    Download and parse a document, sharing the work with any concurrent
+    caller asking for the same URL. `deadline` bounds only this caller's wait.
+    """
+    return await _shared(_load_flight, url, deadline, _load, url, request_id)
+
+
+async def wait_for_namespace(idx, namespace: str, expected: int, request_id: str,
+                             timeout: float = INDEX_WAIT_SECONDS) -> bool:
+    """
+    Poll index stats until `namespace` holds `expected` vectors, so the
+    first queries against a fresh upsert don't come back empty.
+    """
+    start = time.monotonic()
+    while (time.monotonic() - start) < timeout:
+        try:
+            stats = await asyncio.to_thread(idx.describe_index_stats)
+            current = stats.get("namespaces", {}).get(namespace, {}).get("vector_count", 0)
+            if current >= expected:
+                logger.info(f"[{request_id}] {namespace} is ready with {current} vectors")
+                return True
+        except Exception as e:
+            logger.warning(f"[{request_id}] polling failed with error: {e}. Retrying...")
+        await asyncio.sleep(0.5)
+    logger.warning(f"[{request_id}] index update timed out after {timeout}s. Proceeding anyway.")
+    return False
+
+
+async def _ingest(doc: LoadedDocument, request_id: str) -> IngestedDocument:
+    doc_id    = uuid4().hex
+    s3_key    = f"documents/{doc_id}.pdf"
+    namespace = namespace_for(doc_id)
+    # registered before anything is written, so a failure part-way through
+    # still leaves the S3 object and namespace for the reaper
+    try:
+        await asyncio.to_thread(register, namespace, [s3_key])
+        await asyncio.to_thread(_bucket.put_object, Key=s3_key, Body=doc.content)
+        logger.info(f"[{request_id}] uploaded PDF to S3 at {s3_key}")
+    except Exception as e:
+        logger.error(f"[{request_id}] S3 upload error: {e}")
+        raise DocumentStoreError("Failed to push PDF to S3") from e
+
+    chunks    = await admission.run_in_thread("parse", chunk_text, doc.text)
+    vectors   = await admission.run_in_thread("embed", embed_texts, chunks)
+    idx       = get_index()
+    ids       = [f"{doc_id}-{i}" for i in range(len(chunks))]
+    metadatas = [{"source": s3_key, "insurer": doc_id, "url": doc.url, "text": chunk} for chunk in chunks]
+    count     = await asyncio.to_thread(upsert_vectors, idx, ids, vectors, metadatas, namespace)
+    logger.info(f"[{request_id}] upserted {count} chunks into {namespace}")
+    return IngestedDocument(namespace=namespace, s3_key=s3_key, chunk_count=count)
+
+
+async def ingest(doc: LoadedDocument, request_id: str, deadline: Deadline = None) -> IngestedDocument:
+    """
+    Store, chunk, embed and upsert a loaded document into its own ephemeral
+    namespace. Concurrent callers with identical content share one ingest
+    and get the same namespace back; each then waits for the index to catch
+    up within its own deadline.
+    """
+    ingested = await _shared(_ingest_flight, doc.sha256, deadline, _ingest, doc, request_id)
+    if is_low(deadline):
+        logger.warning(f"[{request_id}] short on time, not waiting for {ingested.namespace}")
+    else:
+        idx = await asyncio.to_thread(get_index)
+        await wait_for_namespace(idx, ingested.namespace, ingested.chunk_count, request_id,
+                                 timeout=timeout_for(deadline, INDEX_WAIT_SECONDS))
+    return ingested
+
+
+async def load_all(urls: List[str], request_id: str, deadline: Deadline = None) -> List[LoadedDocument]:
+    """
+    Download and parse several documents concurrently; the admission pools
+    bound how many downloads/parses actually run at once.
+    """
+    async def load_one(url: str) -> LoadedDocument:
+        try:
+            return await load_remote(url, request_id, deadline)
+        except DocumentFetchError as e:
+            raise DocumentFetchError(f"{url}: {e}" if len(urls) > 1 else str(e)) from e
+
+    return list(await asyncio.gather(*(load_one(u) for u in urls)))
+
+
+async def ingest_all(docs: List[LoadedDocument], request_id: str,
+                     deadline: Deadline = None) -> List[str]:
+    """
+    Ingest several documents concurrently. Returns their namespaces in
+    request order (documents with identical content share one).
+    """
+    ingested = await asyncio.gather(*(ingest(d, request_id, deadline) for d in docs))
+    return list(dict.fromkeys(i.namespace for i in ingested))
+
+
+def combined_text(docs: List[LoadedDocument]) -> str:
+    """
+    Full text of one or more documents, each headed by its URL when there
+    are several, so direct-context answers can still attribute sources.
+    """
+    if len(docs) == 1:
+        return docs[0].text
+    return "\n\n".join(f"=== DOCUMENT {i + 1}: {d.url} ===\n{d.text}" for i, d in enumerate(docs))
+
+
+ANSWER_INSTRUCTIONS = """You are a meticulous and detail-oriented insurance policy analyst. Your task is to answer the user's question with maximum precision and completeness, based *only* on the provided context snippets.
+
+Follow these instructions exactly:
+1.  **Analyze the Context:** Carefully read all the provided context snippets to find the most relevant clauses that answer the user's question.
+2.  **Extract All Details:** From the relevant clauses, you must extract every key detail. Pay close attention to the following, and list them if they are present:
+    * **Conditions and Eligibility:** What are the specific requirements, waiting periods, age limits, or pre-requisites?
+    * **Limits and Sub-limits:** Are there any monetary caps, percentage-based limits, or limits on frequency (e.g., "up to 2 deliveries")?
+    * **Specific Criteria:** For definitions (like "Hospital"), what are all the specific criteria listed (e.g., bed count, staff requirements, facilities)?
+    * **Type of Coverage:** Is the coverage for "in-patient," "out-patient," "day care," etc.?
+3.  **Synthesize the Answer:**
+    * Start with a direct, one-sentence answer (e.g., "Yes, this is covered," "No, this is excluded," "The waiting period is X months.").
+    * Answer should be at max 2 lines. 1st Line should have the answer yes/no and the duration or any other important detail. 2nd Line should have details if necessary.
+    * Do no formatting, just plain text. 
+4.  **Handle Missing Information:** If a specific detail is not mentioned in the context, you must explicitly state that (e.g., "* The context does not specify the maximum number of deliveries.")."""
+
+
+def build_answer_prompt(question: str, contexts: List[Dict]) -> str:
+    context_str = "\n---\n".join(f"{c['source']}: {c['text']}…" for c in contexts)
+    prompt = f"""
+{ANSWER_INSTRUCTIONS}
+
+---
+CONTEXT:
+{context_str}
+---
+QUESTION: {question}
+
+ANSWER:
+"""
+    return prompt
+
+
+def _retrieve_contexts(question: str, namespace: Namespaces, deadline: Deadline = None) -> List[Dict]:
+    """
+    Contexts for one question from a single namespace, or from the union of
+    several (multi-document requests) labelled with their document URL.
+    """
+    if isinstance(namespace, str) or len(namespace) == 1:
+        ns = namespace if isinstance(namespace, str) else namespace[0]
+        return retrieve(question, 10, namespace=ns, deadline=deadline)
+    ctxs = retrieve_many(question, namespace, 10, deadline=deadline)
+    for c in ctxs:
+        c["source"] = c.get("url") or c["source"]
+    return ctxs
+
+
+async def _answer_one(q: str, namespace: Namespaces, sem: asyncio.Semaphore,
+                      deadline: Deadline = None) -> str:
+    # `sem` caps one request's fan-out; the admission pools cap the service
+    async with sem:
+        try:
+            ctxs = await asyncio.wait_for(
+                admission.run_in_thread("embed", _retrieve_contexts, q, namespace, deadline),
+                deadline.remaining() if deadline else None,
+            )
+            prompt = build_answer_prompt(q, ctxs)
+            async with admission.slot("llm"):
+                return await achat_general(prompt, timeout=timeout_for(deadline, LLM_TIMEOUT))
+        except (asyncio.TimeoutError, DeadlineExceeded) as e:
+            logger.warning(f"question ran out of time: {e!r}")
+            return TIMEOUT_ANSWER
+
+
+async def answer_questions(questions: List[str], namespace: Namespaces, request_id: str,
+                           concurrency: int = 2, deadline: Deadline = None) -> List[str]:
+    """
+    Retrieve context from `namespace` (or a list of namespaces) and answer
+    each question with the LLM, at most `concurrency` questions at a time.
+    Answers keep question order.
+    """
+    sem = asyncio.Semaphore(concurrency)
+    answers = await asyncio.gather(*(_answer_one(q, namespace, sem, deadline) for q in questions))
+    logger.info(f"[{request_id}] answered {len(answers)} questions")
+    return list(answers)
+
+
+async def iter_answers(questions: List[str], namespace: Namespaces, request_id: str,
+                       concurrency: int = 2, deadline: Deadline = None) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Like `answer_questions`, but yield `(question_index, answer)` as soon as
+    each answer is ready. Unfinished questions are cancelled if the consumer
+    stops early (e.g. the client disconnects).
+    """
+    sem = asyncio.Semaphore(concurrency)
+
+    async def indexed(i: int, q: str) -> Tuple[int, str]:
+        return i, await _answer_one(q, namespace, sem, deadline)
+
+    tasks = [asyncio.create_task(indexed(i, q)) for i, q in enumerate(questions)]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            yield await fut
+    finally:
+        for t in tasks:
+            t.cancel()
+    logger.info(f"[{request_id}] streamed {len(tasks)} answers")
+
+
+async def stream_answer(question: str, namespace: Namespaces, deadline: Deadline = None) -> AsyncIterator[str]:
+    """
+    Answer a single question, yielding LLM tokens as they are generated.
+    """
+    ctxs = await admission.run_in_thread("embed", _retrieve_contexts, question, namespace, deadline)
+    async with admission.slot("llm"):
+        async for token in stream_general(build_answer_prompt(question, ctxs)):
+            yield token
+            if deadline and deadline.expired():
+                logger.warning("stopping answer stream at the request deadline")
+                return
+
+
+# ─── direct-context mode (small documents) ───────────────────────────────────────
+
+def fits_in_context(text: str) -> bool:
+    """
+    Whether a document is small enough to hand to the LLM whole, skipping
+    S3, embedding, upsert, index polling and per-question retrieval.
+    """
+    limit = settings.DIRECT_CONTEXT_MAX_TOKENS
+    return limit > 0 and estimate_tokens(text) <= limit
+
+
+def build_direct_prompt(document: str, questions: List[str]) -> str:
+    numbered = "\n".join(f"{i + 1}. {q}" for i, q in enumerate(questions))
+    return f"""
+{ANSWER_INSTRUCTIONS}
+
+The context below is the complete document. Answer every question.
+Return a single JSON object {{"answers": [...]}} with exactly {len(questions)} plain-text
+strings, one per question, in the same order. Return STRICTLY valid JSON.
+
+---
+CONTEXT:
+{document}
+---
+QUESTIONS:
+{numbered}
+"""
+
+
+def build_direct_question_prompt(document: str, question: str) -> str:
+    return f"""
+{ANSWER_INSTRUCTIONS}
+
+---
+CONTEXT:
+{document}
+---
+QUESTION: {question}
+
+ANSWER:
+"""
+
+
+async def _ask_direct(document: str, question: str, deadline: Deadline = None) -> str:
+    try:
+        async with admission.slot("llm"):
+            return await achat_general(build_direct_question_prompt(document, question),
+                                       timeout=timeout_for(deadline, LLM_TIMEOUT))
+    except (asyncio.TimeoutError, DeadlineExceeded) as e:
+        logger.warning(f"direct question ran out of time: {e!r}")
+        return TIMEOUT_ANSWER
+
+
+async def _ask_cached(cache: str, question: str, deadline: Deadline = None) -> str:
+    try:
+        async with admission.slot("llm"):
+            return await achat_cached(f"QUESTION: {question}\n\nANSWER:", cache,
+                                      timeout=timeout_for(deadline, LLM_TIMEOUT))
+    except (asyncio.TimeoutError, DeadlineExceeded) as e:
+        logger.warning(f"cached question ran out of time: {e!r}")
+        return TIMEOUT_ANSWER
+
+
+@asynccontextmanager
+async def _document_cache(document: str, request_id: str, deadline: Deadline = None):
+    """
+    The document cached on Gemini for the duration of the block. A failed
+    delete is only logged (the cache expires on its own TTL), so it cannot
+    hide the answers or the real error.
+    """
+    async with admission.slot("llm"):
+        cache = await asyncio.wait_for(create_context_cache(f"CONTEXT:\n{document}", ANSWER_INSTRUCTIONS),
+                                       timeout_for(deadline, LLM_TIMEOUT))
+    try:
+        yield cache
+    finally:
+        try:
+            async with admission.slot("llm"):
+                await asyncio.wait_for(delete_context_cache(cache), timeout_for(deadline, LLM_TIMEOUT))
+        except Exception as e:
+            logger.warning(f"[{request_id}] could not delete context cache {cache}: {e!r}")
+
+
+def _use_cache(questions: List[str]) -> bool:
+    return settings.DIRECT_CONTEXT_CACHE and len(questions) > 1
+
+
+async def _answer_direct_batched(document: str, questions: List[str], request_id: str,
+                                 deadline: Deadline = None) -> List[str]:
+    try:
+        async with admission.slot("llm"):
+            raw = await achat_general(build_direct_prompt(document, questions),
+                                      timeout=timeout_for(deadline, LLM_TIMEOUT))
+    except (asyncio.TimeoutError, DeadlineExceeded) as e:
+        logger.warning(f"[{request_id}] direct answer ran out of time: {e!r}")
+        return [TIMEOUT_ANSWER] * len(questions)
+
+    try:
+        answers = _parse_json(raw).get("answers")
+        if not isinstance(answers, list) or len(answers) != len(questions):
+            raise ValueError(f"expected {len(questions)} answers, got: {answers!r}"[:300])
+    except (ValueError, AttributeError) as e:
+        # one bad reply should not fail every question: ask them one by one
+        logger.warning(f"[{request_id}] unusable batched answer ({e}), asking each question separately")
+        return list(await asyncio.gather(*(_ask_direct(document, q, deadline) for q in questions)))
+    return [str(a) for a in answers]
+
+
+async def answer_direct(document: str, questions: List[str], request_id: str,
+                        deadline: Deadline = None) -> List[str]:
+    """
+    Answer all questions from the whole document text. By default this is
+    one LLM call that returns every answer (falling back to one call per
+    question if that reply cannot be used); with DIRECT_CONTEXT_CACHE the
+    document is cached once on Gemini and each question is asked against it.
+    """
+    if _use_cache(questions):
+        try:
+            async with _document_cache(document, request_id, deadline) as cache:
+                answers = await asyncio.gather(*(_ask_cached(cache, q, deadline) for q in questions))
+            logger.info(f"[{request_id}] answered {len(answers)} questions from a cached document prefix")
+            return list(answers)
+        except (asyncio.TimeoutError, DeadlineExceeded) as e:
+            logger.warning(f"[{request_id}] direct answer ran out of time: {e!r}")
+            return [TIMEOUT_ANSWER] * len(questions)
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            # e.g. the document is below Gemini's minimum cacheable size
+            logger.warning(f"[{request_id}] context cache unavailable ({e}), using one prompt")
+
+    answers = await _answer_direct_batched(document, questions, request_id, deadline)
+    logger.info(f"[{request_id}] answered {len(answers)} questions from the whole document")
+    return answers
+
+
+async def iter_direct_answers(document: str, questions: List[str], request_id: str,
+                              deadline: Deadline = None) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Like `answer_direct`, but yield `(question_index, answer)` pairs. With
+    the context cache each answer is yielded as soon as it is ready; the
+    single-prompt mode produces all answers at once.
+    """
+    if _use_cache(questions):
+        answered = set()
+        try:
+            async with _document_cache(document, request_id, deadline) as cache:
+                async def indexed(i: int, q: str) -> Tuple[int, str]:
+                    return i, await _ask_cached(cache, q, deadline)
+
+                tasks = [asyncio.create_task(indexed(i, q)) for i, q in enumerate(questions)]
+                try:
+                    for fut in asyncio.as_completed(tasks):
+                        item = await fut
+                        answered.add(item[0])
+                        yield item
+                finally:
+                    for t in tasks:
+                        t.cancel()
+            return
+        except (asyncio.TimeoutError, DeadlineExceeded) as e:
+            # same outcome as answer_direct: whatever is left times out
+            logger.warning(f"[{request_id}] direct answers ran out of time: {e!r}")
+            for i in range(len(questions)):
+                if i not in answered:
+                    yield i, TIMEOUT_ANSWER
+            return
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            if answered:
+                raise
+            logger.warning(f"[{request_id}] context cache unavailable ({e}), using one prompt")
+
+    for i, answer in enumerate(await _answer_direct_batched(document, questions, request_id, deadline)):
+        yield i, answer
+
+
+async def stream_direct_answer(document: str, question: str, deadline: Deadline = None) -> AsyncIterator[str]:
+    """
+    Answer a single question from the whole document, yielding LLM tokens.
+    """
+    async with admission.slot("llm"):
+        async for token in stream_general(build_direct_question_prompt(document, question)):
+            yield token
+            if deadline and deadline.expired():
+                logger.warning("stopping direct answer stream at the request deadline")
+                return
+
+
+async def index_file(path: Path, source: str = None, progress: Callable[[str], None] = None) -> int:
+    """
+    Parse, chunk, embed and upsert a long-lived corpus document into the
+    default namespace, filtered later by `insurer=<file stem>`.
+
+    Chunks are de-duplicated across the corpus: a chunk already indexed for
+    another document with the same text is not upserted again, its
+    `insurer` and `source` lists just gain this document. A near duplicate
+    gets its own vector but reuses the neighbour's embedding.
+    The registry is kept in memory between files and saved only if no
+    other writer (the CLI, another worker) saved since it was read;
+    otherwise it is reloaded and the plan recomputed.
+    Only parsing and the embedding call hold admission slots; registry and
+    Pinecone bookkeeping run outside them so query-time retrieval is not
+    starved by long uploads. Returns the number of chunks in the document.
+    """
+    progress = progress or (lambda stage: None)
+    source   = source or path.name
+    doc      = path.stem
+
+    progress("parse")
+    text   = await admission.run_in_thread("parse", load_document, path)
+    chunks = await admission.run_in_thread("parse", chunk_text, text)
+
+    profile  = get_profile()
+    idx      = await asyncio.to_thread(get_index, profile)
+    key      = registry_key(index_name(profile))
+    embedded: Dict[str, np.ndarray] = {}     # kept across conflict retries
+    upserted = set()
+
+    async with _registry_lock:
+        # taken out while in use: after a failure the next file reloads it
+        registry = _registries.pop(key, None)
+        for attempt in range(1, REGISTRY_ATTEMPTS + 1):
+            progress("dedup")
+            if registry is None:
+                registry = await asyncio.to_thread(ChunkRegistry.load, key)
+            legacy = doc not in registry.documents
+            plan   = registry.assign(doc, chunks, source)
+
+            progress("embed")
+            new_ids = list(plan.new)
+            await _vectors_for(idx, plan, embedded)
+            if new_ids:
+                metadatas = [
+                    {"source": registry.sources_for(plan.members[cid]), "insurer": plan.members[cid],
+                     "text": plan.new[cid]}
+                    for cid in new_ids
+                ]
+                progress("upsert")
+                vectors = np.stack([embedded[cid] for cid in new_ids])
+                await asyncio.to_thread(upsert_vectors, idx, new_ids, vectors, metadatas)
+                upserted.update(new_ids)
+
+            await asyncio.to_thread(_apply_membership, idx, plan, registry)
+            if legacy:
+                removed = await asyncio.to_thread(_delete_legacy_vectors, idx, doc)
+                if removed:
+                    logger.info(f"Deleted {removed} pre-dedup vectors of {doc}")
+            try:
+                await asyncio.to_thread(registry.save)
+                break
+            except ConditionalWriteFailed:
+                registry = None
+                if attempt == REGISTRY_ATTEMPTS:
+                    raise
+                logger.warning(f"Chunk registry changed while indexing {source}, retrying ({attempt})")
+
+        # vectors written by a losing attempt for chunks the final plan doesn't have
+        orphans = sorted(upserted - set(registry.chunks))
+        if orphans:
+            await asyncio.to_thread(idx.delete, ids=orphans)
+            logger.info(f"Deleted {len(orphans)} vectors left by a conflicting attempt")
+        _registries[key] = registry
+
+    logger.info(
+        f"Indexed {len(plan.chunk_ids)} chunks from {source} "
+        f"({len(new_ids)} new, {len(plan.reuse)} reusing a near duplicate's embedding, "
+        f"{len(plan.chunk_ids) - len(new_ids)} shared)"
+    )
+    return len(plan.chunk_ids)
+
+
+async def _vectors_for(idx, plan, embedded: Dict[str, np.ndarray]) -> None:
+    """
+    Fill `embedded` for the plan's new chunks: copied from the near
+    duplicate where there is one, embedded with Jina otherwise.
+    """
+    missing = [cid for cid in plan.new if cid not in embedded]
+    reused  = {cid: plan.reuse[cid] for cid in missing if cid in plan.reuse}
+    if reused:
+        found = await asyncio.to_thread(_fetch_embeddings, idx, sorted(set(reused.values())))
+        for cid, near in reused.items():
+            if near in found:
+                embedded[cid] = found[near]
+    missing = [cid for cid in missing if cid not in embedded]
+    if missing:
+        vectors = await admission.run_in_thread("embed", embed_texts, [plan.new[cid] for cid in missing])
+        embedded.update(zip(missing, vectors))
+
+
+def _fetch_embeddings(idx, ids: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Full-dimension embeddings of indexed chunks: the rescore copy for
+    reduced profiles, the stored values for the baseline.
+    """
+    out = {}
+    for start in range(0, len(ids), FETCH_BATCH):
+        resp = idx.fetch(ids=ids[start:start + FETCH_BATCH])
+        for vid, vec in resp.vectors.items():
+            payload = (vec.metadata or {}).get("rescore")
+            out[vid] = decode_rescore(payload) if payload else np.asarray(vec.values, dtype=np.float32)
+    return out
+
+
+def _apply_membership(idx, plan, registry: ChunkRegistry) -> None:
+    for cid, docs in plan.members.items():
+        if cid not in plan.new:
+            idx.update(id=cid, set_metadata={"insurer": docs, "source": registry.sources_for(docs)})
+    if plan.deleted:
+        idx.delete(ids=plan.deleted)
+
+
+def _delete_legacy_vectors(idx, doc: str) -> int:
+    """
+    Remove the `<doc>-<i>` vectors written before chunks were de-duplicated,
+    so a migrated document does not show up twice.
+    """
+    pattern = re.compile(rf"{re.escape(doc)}-\d+")
+    stale = [vid for page in idx.list(prefix=f"{doc}-") for vid in page if pattern.fullmatch(vid)]
+    for start in range(0, len(stale), LEGACY_DELETE_BATCH):
+        idx.delete(ids=stale[start:start + LEGACY_DELETE_BATCH])
+    return len(stale)
@@ -1,36 +1,118 @@
 # app/retriever.py
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
+
+import numpy as np
+
 from app.embeddings import embed_texts
-from app.pinecone_client import index
+from app.pinecone_client import get_index
+from app.deadline import Deadline, is_low
+from app.embedding_profiles import (
+    EmbeddingProfile, FULL_DIMENSION, get_profile, truncate, quantize, rescore,
+)
 
-def retrieve(
-    query: str,
-    top_k: int = 50,
-    insurer: str = None
-) -> List[Dict]:
-    vectors = embed_texts([query], task="retrieval.passage")
-    if not vectors:
-        return []
-    q_vec = [float(x) for x in vectors[0]]
+def _embed_query(query: str, profile: EmbeddingProfile, deadline: Deadline = None):
+    """
+    Returns (first-pass query vector, full-dimension query for rescoring).
+    """
+    vectors = embed_texts([query], task="retrieval.passage", deadline=deadline)
+    if len(vectors) == 0:
+        return None, None
+    q_reduced = truncate(vectors, profile.dimension)[0]
+    q_vec     = quantize(q_reduced[None], profile.quantization)[0] if profile.rescores else q_reduced
+    return q_vec, truncate(vectors, FULL_DIMENSION)[0]
 
-    pinecone_filter = {}
-    if insurer:
-        pinecone_filter["insurer"] = {"$eq": insurer}
+def _source(metadata: dict, insurer: str = None) -> str:
+    """
+    Corpus chunks shared by several documents carry one source per
+    `insurer` entry; report the filtered document's, or all of them.
+    """
+    source = metadata.get("source")
+    if not isinstance(source, list):
+        return source
+    docs = metadata.get("insurer") or []
+    if insurer in docs and len(docs) == len(source):
+        return source[docs.index(insurer)]
+    return ", ".join(source)
 
-    resp = index.query(
-        vector=q_vec,
-        top_k=top_k,
+def _query(q_vec: np.ndarray, profile: EmbeddingProfile, top_k: int,
+           pinecone_filter: dict = None, namespace: str = None, insurer: str = None) -> List[Dict]:
+    resp = get_index(profile).query(
+        vector=q_vec.tolist(),
+        top_k=top_k * profile.oversample,
         include_metadata=True,
         filter=pinecone_filter or None,
+        namespace=namespace,
     )
-    print(f"Insurer: {insurer}, top_k: {top_k}, results: {len(resp.get('matches', []))}")
     out = []
     for m in resp.get("matches", []):
         out.append({
-            "id":     m["id"],
-            "score":  m["score"],
-            "source": m["metadata"].get("source"),
-            "text":   m["metadata"].get("text"),
+            "id":        m["id"],
+            "score":     m["score"],
+            "source":    _source(m["metadata"], insurer),
+            "text":      m["metadata"].get("text"),
+            "url":       m["metadata"].get("url"),
+            "namespace": namespace,
+            "rescore":   m["metadata"].get("rescore"),
         })
     return out
+
+def _finish(matches: List[Dict], q_float: np.ndarray, profile: EmbeddingProfile, top_k: int) -> List[Dict]:
+    # reduced/quantized profiles: re-rank the shortlist with the full 1024-d vectors
+    if profile.rescores:
+        matches = rescore(q_float, [m for m in matches if m["rescore"]], top_k)
+    else:
+        matches = sorted(matches, key=lambda m: m["score"], reverse=True)[:top_k]
+    for m in matches:
+        m.pop("rescore", None)
+    return matches
+
+def retrieve(
+    query: str,
+    top_k: int = 50,
+    insurer: str = None,
+    namespace: str = None,
+    deadline: Deadline = None,
+) -> List[Dict]:
+    # short on time: a smaller shortlist means a faster query and a shorter prompt
+    if is_low(deadline):
+        top_k = max(1, top_k // 2)
+
+    profile = get_profile()
+    q_vec, q_float = _embed_query(query, profile, deadline)
+    if q_vec is None:
+        return []
+
+    pinecone_filter = {}
+    if insurer:
+        # corpus chunks list every document they appear in; $in matches list members
+        pinecone_filter["insurer"] = {"$in": [insurer]}
+
+    matches = _query(q_vec, profile, top_k, pinecone_filter, namespace, insurer)
+    print(f"Insurer: {insurer}, top_k: {top_k}, results: {len(matches)}")
+    return _finish(matches, q_float, profile, top_k)
+
+def retrieve_many(
+    query: str,
+    namespaces: List[str],
+    top_k: int = 10,
+    deadline: Deadline = None,
+) -> List[Dict]:
+    """
+    Retrieve across several namespaces at once: the query is embedded once,
+    each namespace is searched in parallel and the best `top_k` matches of
+    the union are kept. Each match carries the namespace it came from.
+    """
+    if is_low(deadline):
+        top_k = max(1, top_k // 2)
+
+    profile = get_profile()
+    q_vec, q_float = _embed_query(query, profile, deadline)
+    if q_vec is None:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max(1, len(namespaces))) as pool:
+        parts = pool.map(lambda ns: _query(q_vec, profile, top_k, namespace=ns), namespaces)
+        matches = [m for part in parts for m in part]
+    return _finish(matches, q_float, profile, top_k)
@@ -1,4 +1,6 @@
 import json
+from typing import Optional, Tuple
+
 import boto3
 from botocore.exceptions import ClientError
 from app.config import settings
@@ -23,5 +25,38 @@ def load_json(key: str) -> dict:
             return {}
         raise
 
+class ConditionalWriteFailed(Exception):
+    """
+    The object changed (or appeared) since it was read.
+    """
+
+def load_json_tagged(key: str) -> Tuple[dict, Optional[str]]:
+    """
+    `load_json` plus the object's ETag (None if it does not exist yet),
+    for a later `save_json_if`.
+    """
+    try:
+        resp = _bucket.Object(key).get()
+        return json.loads(resp["Body"].read()), resp["ETag"]
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "NoSuchKey":
+            return {}, None
+        raise
+
+def save_json_if(key: str, obj: dict, etag: Optional[str]) -> str:
+    """
+    `save_json` only if the object still has `etag` (or, for None, still
+    does not exist). Returns the new ETag; raises ConditionalWriteFailed
+    instead of overwriting someone else's write.
+    """
+    cond = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+    try:
+        resp = _bucket.Object(key).put(Body=json.dumps(obj).encode("utf-8"), **cond)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("PreconditionFailed", "ConditionalRequestConflict"):
+            raise ConditionalWriteFailed(key) from e
+        raise
+    return resp["ETag"]
+
 def list_keys(prefix: str) -> list:
     return [o.key for o in _bucket.objects.filter(Prefix=prefix)]
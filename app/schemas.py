@@ -1,5 +1,5 @@
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import Annotated, Any, Dict, List, Optional, Union
+from pydantic import BaseModel, Field
 
 class QueryRequest(BaseModel):
     request_id: Optional[str] = None
@@ -33,8 +33,30 @@ class QueryLog(BaseModel):
     response: dict  # could be QueryResponse or GeneralResponse
 
 class MultiQuestionRequest(BaseModel):
-    documents: str
+    # one URL, or several (at least one) to answer across
+    documents: Union[str, Annotated[List[str], Field(min_length=1)]]
     questions: List[str]
+
+    def document_urls(self) -> List[str]:
+        return [self.documents] if isinstance(self.documents, str) else list(self.documents)
     
 class AnswerResponse(BaseModel):
-    answers: List[str]
\ No newline at end of file
+    answers: List[str]
+
+class JobStage(BaseModel):
+    name: str
+    status: str
+    detail: Optional[str] = None
+    started_at: float
+    finished_at: Optional[float] = None
+
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    stages: List[JobStage] = []
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+    attempts: int = 0
@@ -0,0 +1,47 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one in-flight coroutine.
+
+    The first caller (the leader) starts the work as a task; every caller,
+    leader included, awaits that same task. If it raises, all of them get
+    the exception. A caller being cancelled only cancels the shared work
+    when nobody else is still waiting on it. Keys are forgotten as soon as
+    the work finishes, so later calls start fresh.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(fn(*args, **kwargs)))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _t, key=key, call=call: self._forget(key, call))
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
@@ -0,0 +1,8 @@
+import json
+
+
+def format_event(event: str, data) -> str:
+    """
+    Serialise one server-sent event. `data` is JSON-encoded on a single line.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
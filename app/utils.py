@@ -10,3 +10,10 @@ def get_logger(name: str) -> logging.Logger:
 
 def generate_id() -> str:
     return uuid.uuid4().hex
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token for English prose),
+    good enough for routing decisions without a tokenizer round-trip.
+    """
+    return len(text) // 4
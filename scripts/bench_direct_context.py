@@ -0,0 +1,78 @@
+"""
+Latency crossover between direct-context answering and the RAG path.
+
+Truncates one document to increasing token counts and times both paths
+on the same questions; pick DIRECT_CONTEXT_MAX_TOKENS below the crossover.
+
+    python -m scripts.bench_direct_context data/docs/policy.pdf --questions questions.txt
+"""
+import argparse
+import asyncio
+import hashlib
+import time
+from pathlib import Path
+from uuid import uuid4
+
+from app.docs_loader import load_document
+from app.pipeline import LoadedDocument, ingest, answer_questions, answer_direct
+from app.utils import get_logger, estimate_tokens
+
+logger = get_logger(__name__)
+
+SIZES = [1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000]
+
+
+async def _timed(coro) -> float:
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+
+async def _rag(text: str, questions: list, request_id: str) -> None:
+    doc = LoadedDocument(
+        url=f"bench://{request_id}",
+        content=text.encode("utf-8"),
+        text=text,
+        # unique per run so the ingest single-flight never shares work between sizes
+        sha256=hashlib.sha256(f"{request_id}:{text}".encode("utf-8")).hexdigest(),
+    )
+    ingested = await ingest(doc, request_id)
+    await answer_questions(questions, ingested.namespace, request_id)
+
+
+async def bench(text: str, questions: list, sizes: list = SIZES) -> list:
+    rows = []
+    for tokens in sizes:
+        part = text[: tokens * 4]
+        if rows and estimate_tokens(part) <= rows[-1]["tokens"]:
+            break  # document exhausted
+        request_id = uuid4().hex
+        direct = await _timed(answer_direct(part, questions, request_id))
+        rag    = await _timed(_rag(part, questions, request_id))
+        rows.append({"tokens": estimate_tokens(part), "direct": direct, "rag": rag})
+        logger.info(f"{rows[-1]}")
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("document", type=Path)
+    parser.add_argument("--questions", type=Path, required=True, help="one question per line")
+    args = parser.parse_args()
+
+    text = load_document(args.document)
+    questions = [q.strip() for q in args.questions.read_text().splitlines() if q.strip()]
+    rows = asyncio.run(bench(text, questions))
+
+    print(f"{'tokens':>8}{'direct s':>10}{'rag s':>10}")
+    for r in rows:
+        print(f"{r['tokens']:>8}{r['direct']:>10.2f}{r['rag']:>10.2f}")
+    crossover = next((r["tokens"] for r in rows if r["rag"] < r["direct"]), None)
+    if crossover:
+        print(f"RAG becomes faster at ~{crossover} tokens")
+    else:
+        print("Direct context was faster at every measured size")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Recall report for the embedding profiles in app/embedding_profiles.py.
+
+Embeds the corpus chunks and a set of queries once at full dimension,
+takes exact full-precision cosine top-k as ground truth, and simulates
+each profile's reduced/quantized first pass + rescoring locally.
+
+    python -m scripts.embedding_recall --queries queries.txt --k 10
+"""
+import argparse
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.docs_loader import load_document
+from app.chunking import chunk_text
+from app.embeddings import embed_texts
+from app.embedding_profiles import PROFILES, FULL_DIMENSION, search_local
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+EMBED_BATCH = 128
+
+
+def _embed_all(texts: list) -> np.ndarray:
+    parts = [
+        embed_texts(texts[i:i + EMBED_BATCH], dimensions=FULL_DIMENSION)
+        for i in range(0, len(texts), EMBED_BATCH)
+    ]
+    return np.concatenate(parts)
+
+
+def recall_report(docs: np.ndarray, queries: np.ndarray, k: int) -> list:
+    baseline = search_local(docs, queries, PROFILES["full"], k)
+    rows = []
+    for profile in PROFILES.values():
+        start = time.perf_counter()
+        found = search_local(docs, queries, profile, k)
+        elapsed = time.perf_counter() - start
+        recall = np.mean([len(set(f) & set(b)) / len(b) for f, b in zip(found, baseline)])
+        rows.append({
+            "profile":   profile.name,
+            "dimension": profile.dimension,
+            "quant":     profile.quantization,
+            "first":     profile.first_pass_bytes(),
+            "stored":    profile.stored_bytes(),
+            "query_kb":  profile.query_bytes(k) / 1024,
+            "recall":    float(recall),
+            "ms/query":  1000 * elapsed / len(queries),
+        })
+    return rows
+
+
+def run(queries_path: Path, k: int) -> list:
+    docs_dir = Path(os.getenv("DOCS_PATH", "data/docs"))
+    chunks = []
+    for path in docs_dir.iterdir():
+        if path.is_file():
+            chunks.extend(chunk_text(load_document(path)))
+    queries = [q.strip() for q in queries_path.read_text().splitlines() if q.strip()]
+    logger.info(f"Embedding {len(chunks)} chunks and {len(queries)} queries")
+
+    rows = recall_report(_embed_all(chunks), _embed_all(queries), k)
+    # first-pass: native size of the search representation; stored: what Pinecone
+    # actually holds per vector (float32 values + rescore metadata); KB/query:
+    # rescore payloads fetched with each shortlist
+    print(f"{'profile':<14}{'dim':>6}{'quant':>8}{'first-pass':>12}{'stored':>9}{'KB/query':>10}"
+          f"{'recall@' + str(k):>11}{'ms/query':>10}")
+    for r in rows:
+        print(f"{r['profile']:<14}{r['dimension']:>6}{r['quant']:>8}{r['first']:>12}{r['stored']:>9}"
+              f"{r['query_kb']:>10.1f}{r['recall']:>11.3f}{r['ms/query']:>10.2f}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=Path, required=True, help="one query per line")
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+    run(args.queries, args.k)
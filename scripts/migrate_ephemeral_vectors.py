@@ -0,0 +1,55 @@
+"""
+One-off cleanup of /hackrx/run vectors written before per-request
+namespaces: `<request_id>-<i>` vectors with `insurer=<request_id>` in the
+default namespace, plus their `documents/<request_id>.pdf` objects in S3.
+
+    python -m scripts.migrate_ephemeral_vectors            # dry run
+    python -m scripts.migrate_ephemeral_vectors --delete
+"""
+import argparse
+import re
+
+from app.pinecone_client import get_index
+from app.s3_storage import _bucket
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+# request ids were uuid4().hex; corpus ids are `<file stem>-<i>` or `chunk-<sha1>`
+LEGACY_ID = re.compile(r"([0-9a-f]{32})-\d+")
+DELETE_BATCH = 1000
+
+
+def find_legacy(idx) -> dict:
+    """
+    Legacy vector ids in the default namespace, grouped by request id.
+    """
+    found = {}
+    for page in idx.list():
+        for vid in page:
+            m = LEGACY_ID.fullmatch(vid)
+            if m:
+                found.setdefault(m.group(1), []).append(vid)
+    return found
+
+
+def run(delete: bool = False) -> int:
+    idx = get_index()
+    found = find_legacy(idx)
+    ids = [vid for vids in found.values() for vid in vids]
+    logger.info(f"{len(ids)} legacy vectors from {len(found)} requests")
+    if not delete:
+        return len(ids)
+
+    for start in range(0, len(ids), DELETE_BATCH):
+        idx.delete(ids=ids[start:start + DELETE_BATCH])
+    for request_id in found:
+        _bucket.Object(f"documents/{request_id}.pdf").delete()
+    logger.info(f"deleted {len(ids)} vectors and {len(found)} documents")
+    return len(ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--delete", action="store_true", help="actually delete (default: dry run)")
+    run(parser.parse_args().delete)
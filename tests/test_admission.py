@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from app.admission import StagePool, AdmissionRejected
+
+def test_full_queue_fails_fast():
+    pool = StagePool("llm", capacity=1, max_queue=1, wait_timeout=1.0)
+
+    async def main():
+        async with pool.slot("a"):
+            waiter = asyncio.create_task(pool.slot("a").__aenter__())
+            await asyncio.sleep(0.01)
+            with pytest.raises(AdmissionRejected) as exc:
+                async with pool.slot("a"):
+                    pass
+            waiter.cancel()
+            return exc.value
+
+    rejected = asyncio.run(main())
+    assert rejected.stage == "llm"
+    assert rejected.retry_after > 0
+
+def test_wait_timeout_rejects():
+    pool = StagePool("parse", capacity=1, max_queue=4, wait_timeout=0.02)
+
+    async def main():
+        async with pool.slot("a"):
+            async with pool.slot("b"):
+                pass
+
+    with pytest.raises(AdmissionRejected):
+        asyncio.run(main())
+
+def test_fair_share_between_tenants():
+    pool = StagePool("embed", capacity=4, max_queue=16, wait_timeout=1.0)
+    started = []
+
+    async def job(tenant):
+        async with pool.slot(tenant):
+            started.append(tenant)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(job("a") for _ in range(12)), *(job("b") for _ in range(4)))
+
+    asyncio.run(main())
+    assert pool.in_use == 0
+    # b is not queued behind a's whole backlog
+    last = {t: i for i, t in enumerate(started)}
+    assert last["b"] < last["a"]
+
+def test_abandoned_thread_keeps_its_slot():
+    import threading
+    pool = StagePool("llm", capacity=1, max_queue=4, wait_timeout=1.0)
+    release = threading.Event()
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(pool.run_in_thread(release.wait), 0.02)
+        held = pool.in_use
+        release.set()
+        await asyncio.sleep(0.05)
+        return held
+
+    assert asyncio.run(main()) == 1
+    assert pool.in_use == 0
+
+def test_other_tenant_does_not_strand_free_slots():
+    # one long background slot must not cap a busy tenant at half the pool
+    pool = StagePool("embed", capacity=8, max_queue=0, wait_timeout=1.0)
+    running, peak = [0], [0]
+
+    async def request():
+        async with pool.slot("bearer"):
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            await asyncio.sleep(0.01)
+            running[0] -= 1
+
+    async def main():
+        async with pool.slot("jobs"):
+            await asyncio.gather(*(request() for _ in range(7)))
+
+    asyncio.run(main())   # max_queue=0: any wait would have been a rejection
+    assert peak[0] == 7
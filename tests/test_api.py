@@ -6,3 +6,9 @@ client = TestClient(app)
 def test_query_endpoint():
     resp = client.post("/query", json={"query": "46M knee surgery Pune 3 months"})
     assert resp.status_code in (200, 500)  # 500 if LLM/Pinecone not wired yet
+
+def test_query_endpoint_stream():
+    resp = client.post("/query?stream=true", json={"query": "46M knee surgery Pune 3 months"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    assert "event: result" in resp.text or "event: error" in resp.text
@@ -0,0 +1,23 @@
+import pytest
+from app.deadline import Deadline, DeadlineExceeded, exhausted, timeout_for
+
+def test_stage_timeout_clipped_to_remaining_budget():
+    deadline = Deadline(2.0)
+    assert timeout_for(deadline, 30) <= 2.0
+    assert timeout_for(deadline, 0.5) == 0.5
+    assert timeout_for(None, 30) == 30
+
+def test_expired_deadline_raises():
+    deadline = Deadline(0)
+    assert deadline.expired()
+    with pytest.raises(DeadlineExceeded):
+        deadline.timeout(5)
+
+def test_from_header():
+    assert Deadline.from_header("1500").budget == 1.5
+    assert Deadline.from_header("junk").budget == Deadline.from_header(None).budget
+
+def test_exhausted_only_near_the_deadline():
+    assert exhausted(Deadline(0))
+    assert not exhausted(Deadline(30))
+    assert not exhausted(None)
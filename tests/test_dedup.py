@@ -0,0 +1,51 @@
+from app.dedup import ChunkRegistry, fingerprint
+
+CLAUSE = ("Pre-existing diseases are covered after a waiting period of thirty six months "
+          "of continuous coverage from the first policy inception date, subject to the "
+          "sum insured and all other terms and conditions of this policy.")
+
+def test_fingerprint_ignores_whitespace_and_case():
+    assert fingerprint("Grace  Period\nof 30 days") == fingerprint("grace period of 30 days")
+
+def test_shared_chunk_embedded_once():
+    reg = ChunkRegistry()
+    first  = reg.assign("policy-a", [CLAUSE, "Only in policy A."])
+    second = reg.assign("policy-b", [CLAUSE, "Only in policy B."])
+
+    assert len(first.new) == 2
+    assert len(second.new) == 1
+    shared = first.chunk_ids[0]
+    assert second.chunk_ids[0] == shared
+    assert reg.chunks[shared]["docs"] == ["policy-a", "policy-b"]
+
+def test_near_duplicate_keeps_its_own_text():
+    # a one-term edit ("thirty" -> "fifteen") must not answer with the other wording
+    long_clause = " ".join(f"{CLAUSE} Schedule {i} applies to plan variant {i * 7}." for i in range(8))
+    edited = long_clause.replace("thirty six months", "fifteen months", 1)
+    reg = ChunkRegistry()
+    first = reg.assign("policy-a", [long_clause])
+    plan  = reg.assign("policy-b", [edited])
+
+    assert list(plan.new.values()) == [edited]
+    assert plan.chunk_ids != first.chunk_ids
+    # only the embedding may be borrowed from the neighbour
+    assert plan.reuse == {plan.chunk_ids[0]: first.chunk_ids[0]}
+    assert reg.chunks[first.chunk_ids[0]]["docs"] == ["policy-a"]
+
+def test_reingest_drops_unused_chunks():
+    reg = ChunkRegistry()
+    reg.assign("policy-a", ["Old clause that goes away after the update."])
+    plan = reg.assign("policy-a", [CLAUSE])
+    assert len(plan.deleted) == 1
+    assert reg.documents["policy-a"] == plan.chunk_ids
+
+def test_shared_chunk_lists_each_documents_source():
+    reg = ChunkRegistry()
+    reg.assign("policy-a", [CLAUSE], "policy-a.pdf")
+    plan = reg.assign("policy-b", [CLAUSE], "policy-b.pdf")
+    shared = plan.chunk_ids[0]
+    assert reg.sources_for(plan.members[shared]) == ["policy-a.pdf", "policy-b.pdf"]
+
+def test_registry_key_depends_on_index():
+    from app.dedup import registry_key
+    assert registry_key("policy-retrieval") != registry_key("policy-retrieval-d256")
@@ -0,0 +1,68 @@
+import numpy as np
+from app.embedding_profiles import (
+    PROFILES,
+    truncate,
+    quantize,
+    prepare,
+    rescore,
+    decode_rescore,
+    encode_rescore,
+    search_local,
+)
+
+def _unit(n, d, seed=0):
+    v = np.random.default_rng(seed).standard_normal((n, d)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+def test_truncate_renormalises():
+    v = truncate(_unit(3, 1024), 256)
+    assert v.shape == (3, 256)
+    assert np.allclose(np.linalg.norm(v, axis=1), 1.0, atol=1e-5)
+
+def test_binary_quantization_is_sign():
+    q = quantize(np.array([[0.3, -0.2, 0.0]], dtype=np.float32), "binary")
+    assert q.tolist() == [[1.0, -1.0, -1.0]]
+
+def test_rescore_orders_by_exact_cosine():
+    docs = _unit(5, 1024)
+    values, payloads = prepare(docs, PROFILES["d256-binary"])
+    assert values.shape == (5, 256) and len(payloads) == 5
+
+    query = docs[2]
+    matches = [{"id": str(i), "rescore": p} for i, p in enumerate(payloads)]
+    assert rescore(query, matches, top_k=1)[0]["id"] == "2"
+
+def _matryoshka_set(n_docs=500, n_queries=20, seed=3):
+    # variance decays along the dimensions, as in Matryoshka embeddings;
+    # queries are noisy copies of the first documents
+    rng = np.random.default_rng(seed)
+    weights = np.exp(-np.arange(1024) / 256).astype(np.float32)
+    docs = rng.standard_normal((n_docs, 1024)).astype(np.float32) * weights
+    docs /= np.linalg.norm(docs, axis=1, keepdims=True)
+    noise = rng.standard_normal((n_queries, 1024)).astype(np.float32) * weights
+    queries = docs[:n_queries] + 0.5 * noise / np.linalg.norm(weights)
+    return docs, queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+def test_reduced_profiles_keep_recall():
+    docs, queries = _matryoshka_set()
+    baseline = search_local(docs, queries, PROFILES["full"], 10)
+    for name in ["d512", "d256", "d256-int8"]:
+        found = search_local(docs, queries, PROFILES[name], 10)
+        recall = np.mean([len(set(f) & set(b)) / 10 for f, b in zip(found, baseline)])
+        assert recall >= 0.9, name
+
+def test_stored_bytes_include_rescore_payload():
+    full, binary = PROFILES["full"], PROFILES["d256-binary"]
+    assert binary.first_pass_bytes() == 32
+    assert binary.stored_bytes() == 256 * 4 + binary.rescore_bytes()
+    assert binary.rescore_bytes() == len(encode_rescore(np.zeros(1024, dtype=np.float32)))
+    assert full.stored_bytes() == 4096 and full.query_bytes(10) == 0
+
+def test_rescore_payload_keeps_full_dimension():
+    docs = _unit(4, 1024)
+    _, payloads = prepare(docs, PROFILES["d256"])
+    assert decode_rescore(payloads[0]).shape == (1024,)
+    # the full vector separates what the 256-d prefix alone cannot
+    docs[1, :256] = docs[0, :256]
+    matches = [{"id": str(i), "rescore": p} for i, p in enumerate(prepare(docs, PROFILES["d256"])[1])]
+    assert rescore(docs[1] / np.linalg.norm(docs[1]), matches, top_k=1)[0]["id"] == "1"
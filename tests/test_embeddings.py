@@ -4,3 +4,41 @@ def test_embed_length():
     vecs = embed_texts(["hello", "world"])
     assert len(vecs) == 2
     assert len(vecs[0]) == 1536
+
+def test_decode_base64_float32():
+    import base64
+    import numpy as np
+    from app.embeddings import _decode
+
+    vec = np.arange(4, dtype="<f4")
+    decoded = _decode(base64.b64encode(vec.tobytes()).decode())
+    assert decoded.dtype == np.float32
+    assert np.array_equal(decoded, vec)
+    assert np.array_equal(_decode([0.0, 1.0, 2.0, 3.0]), vec)
+
+def test_body_read_timeout_at_deadline_is_deadline_exceeded(monkeypatch):
+    import pytest
+    import requests
+    from urllib3.exceptions import ReadTimeoutError
+    from app import embeddings
+    from app.deadline import Deadline, DeadlineExceeded
+
+    class StalledResponse:
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            return False
+        def raise_for_status(self):
+            pass
+        def iter_content(self, size):
+            # what requests raises for a read timeout while streaming the body
+            raise requests.ConnectionError(ReadTimeoutError(None, None, "Read timed out."))
+            yield b""
+
+    class Session:
+        def post(self, *args, **kwargs):
+            return StalledResponse()
+
+    monkeypatch.setattr(embeddings, "get_session", lambda: Session())
+    with pytest.raises(DeadlineExceeded):
+        embeddings.embed_texts(["hello"], deadline=Deadline(0.2))
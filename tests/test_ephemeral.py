@@ -0,0 +1,36 @@
+from app.ephemeral import namespace_for, is_expired
+
+def test_namespace_isolated_from_default():
+    ns = namespace_for("abc123")
+    assert ns.endswith("abc123")
+    assert ns != "abc123"
+
+def test_is_expired():
+    entry = {"namespace": "tmp-x", "s3_keys": [], "expires_at": 100.0}
+    assert not is_expired(entry, now=99.0)
+    assert is_expired(entry, now=100.0)
+
+def test_failed_vector_delete_keeps_registry_entry(monkeypatch):
+    import pytest
+    from app import ephemeral
+
+    deleted = []
+
+    class FakeObject:
+        def __init__(self, key):
+            self.key = key
+        def delete(self):
+            deleted.append(self.key)
+
+    class FakeBucket:
+        Object = FakeObject
+
+    class FlakyIndex:
+        def delete(self, **kwargs):
+            raise RuntimeError("pinecone unavailable")
+
+    monkeypatch.setattr(ephemeral, "_bucket", FakeBucket())
+    entry = {"namespace": "tmp-x", "s3_keys": ["documents/x.pdf"], "expires_at": 0}
+    with pytest.raises(RuntimeError):
+        ephemeral.delete_namespace(FlakyIndex(), entry)
+    assert deleted == []
@@ -0,0 +1,33 @@
+import asyncio
+import socket
+from app import http_client
+from app.config import settings
+
+def test_dns_cache_is_bounded_and_uninstalled(monkeypatch):
+    calls = []
+
+    def resolver(host, *args):
+        calls.append(host)
+        return [host]
+
+    monkeypatch.setattr(socket, "getaddrinfo", resolver)
+    monkeypatch.setattr(settings, "DNS_CACHE_SIZE", 2)
+
+    http_client.install_dns_cache()
+    try:
+        for host in ["a", "a", "b", "c", "a"]:
+            socket.getaddrinfo(host, 443)
+        assert calls == ["a", "b", "c", "a"]   # misses use the wrapped resolver; "a" was evicted by "c"
+        assert len(http_client._dns_cache) == 2
+    finally:
+        http_client.uninstall_dns_cache()
+    assert socket.getaddrinfo is resolver
+    assert not http_client._dns_cache
+
+def test_idle_host_slots_are_dropped():
+    async def main():
+        async with http_client.host_slot("https://example.com/a.pdf"):
+            assert "example.com" in http_client._host_slots
+        return dict(http_client._host_slots)
+
+    assert "example.com" not in asyncio.run(main())
@@ -0,0 +1,61 @@
+import asyncio
+from app.jobs import JobStore, JobRunner, handler, SUCCEEDED, FAILED
+
+@handler("test_echo")
+async def _echo(payload, progress):
+    progress("first")
+    progress("second", "detail")
+    return {"echo": payload["value"]}
+
+@handler("test_fail")
+async def _fail(payload, progress):
+    progress("boom")
+    raise RuntimeError("stage failed")
+
+def test_job_succeeds_with_stages(tmp_path):
+    store  = JobStore(str(tmp_path / "jobs.db"))
+    runner = JobRunner(store, workers=1)
+    job = store.create("test_echo", {"value": 42})
+    asyncio.run(runner.run_job(job["job_id"]))
+
+    done = store.get(job["job_id"])
+    assert done["status"] == SUCCEEDED
+    assert done["result"] == {"echo": 42}
+    assert [s["name"] for s in done["stages"]] == ["first", "second"]
+    assert all(s["status"] == SUCCEEDED for s in done["stages"])
+
+def test_job_failure_recorded(tmp_path):
+    store  = JobStore(str(tmp_path / "jobs.db"))
+    runner = JobRunner(store, workers=1)
+    job = store.create("test_fail", {})
+    asyncio.run(runner.run_job(job["job_id"]))
+
+    failed = store.get(job["job_id"])
+    assert failed["status"] == FAILED
+    assert "stage failed" in failed["error"]
+    assert failed["stages"][-1]["status"] == FAILED
+
+def test_unfinished_jobs_survive_reopen(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    job = JobStore(path).create("test_echo", {"value": 1})
+    assert JobStore(path).unfinished() == [job["job_id"]]
+
+def test_job_interrupted_too_often_is_failed(tmp_path):
+    from app.config import settings
+    from app.jobs import RUNNING
+
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job = store.create("test_echo", {"value": 1})
+    store.update(job["job_id"], status=RUNNING, attempts=settings.JOB_MAX_ATTEMPTS)
+
+    async def main():
+        runner = JobRunner(store, workers=1)
+        await runner.start()
+        queued = runner._queue.qsize()
+        await runner.stop()
+        return queued
+
+    assert asyncio.run(main()) == 0
+    gave_up = store.get(job["job_id"])
+    assert gave_up["status"] == FAILED
+    assert "not retried" in gave_up["error"]
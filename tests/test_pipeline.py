@@ -0,0 +1,113 @@
+import asyncio
+from app import pipeline
+from app.config import settings
+
+def _fake_llm(monkeypatch, batched_reply):
+    prompts = []
+
+    async def achat_general(prompt, timeout=None):
+        prompts.append(prompt)
+        if "Answer every question." in prompt:
+            return batched_reply
+        return "single: " + prompt.rsplit("QUESTION: ", 1)[1].split("\n")[0]
+
+    monkeypatch.setattr(pipeline, "achat_general", achat_general)
+    monkeypatch.setattr(settings, "DIRECT_CONTEXT_CACHE", False)
+    return prompts
+
+def test_fits_in_context(monkeypatch):
+    monkeypatch.setattr(settings, "DIRECT_CONTEXT_MAX_TOKENS", 100)
+    assert pipeline.fits_in_context("a" * 400)
+    assert not pipeline.fits_in_context("a" * 404)
+    monkeypatch.setattr(settings, "DIRECT_CONTEXT_MAX_TOKENS", 0)
+    assert not pipeline.fits_in_context("short")
+
+def test_batched_reply_used(monkeypatch):
+    prompts = _fake_llm(monkeypatch, '{"answers": ["one", "two"]}')
+    answers = asyncio.run(pipeline.answer_direct("doc", ["q1", "q2"], "r"))
+    assert answers == ["one", "two"]
+    assert len(prompts) == 1
+
+def test_malformed_batched_reply_falls_back_per_question(monkeypatch):
+    _fake_llm(monkeypatch, "sorry, no JSON here")
+    answers = asyncio.run(pipeline.answer_direct("doc", ["q1", "q2"], "r"))
+    assert answers == ["single: q1", "single: q2"]
+
+def test_wrong_length_batched_reply_falls_back_per_question(monkeypatch):
+    _fake_llm(monkeypatch, '{"answers": ["only one"]}')
+    answers = asyncio.run(pipeline.answer_direct("doc", ["q1", "q2"], "r"))
+    assert answers == ["single: q1", "single: q2"]
+
+def test_streamed_direct_answers_time_out_like_answer_direct(monkeypatch):
+    async def slow(*args, **kwargs):
+        raise asyncio.TimeoutError()
+
+    async def fake_cache(*args, **kwargs):
+        return "cache"
+
+    async def no_op(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(settings, "DIRECT_CONTEXT_CACHE", True)
+    monkeypatch.setattr(pipeline, "create_context_cache", slow)
+    monkeypatch.setattr(pipeline, "delete_context_cache", no_op)
+
+    async def main():
+        streamed = [a async for a in pipeline.iter_direct_answers("doc", ["q1", "q2"], "r")]
+        return sorted(streamed), await pipeline.answer_direct("doc", ["q1", "q2"], "r")
+
+    streamed, answered = asyncio.run(main())
+    assert [a for _, a in streamed] == answered == [pipeline.TIMEOUT_ANSWER] * 2
+
+class _FakeIndex:
+    def __init__(self):
+        self.upserted, self.deleted = [], []
+    def upsert(self, vectors, namespace=None):
+        self.upserted.extend(v[0] for v in vectors)
+    def update(self, **kwargs):
+        pass
+    def delete(self, ids=None, **kwargs):
+        self.deleted.extend(ids or [])
+    def list(self, prefix=None, **kwargs):
+        return iter([])
+
+def _fake_corpus(monkeypatch, saves):
+    import numpy as np
+    from app.dedup import ChunkRegistry
+    from app.s3_storage import ConditionalWriteFailed
+
+    idx, loads = _FakeIndex(), []
+
+    def load(key):
+        loads.append(key)
+        return ChunkRegistry(key=key)
+
+    def save(self):
+        if saves and saves.pop(0) == "conflict":
+            raise ConditionalWriteFailed(self.key)
+
+    monkeypatch.setattr(pipeline, "_registries", {})
+    monkeypatch.setattr(pipeline, "load_document", lambda path: path.stem)
+    monkeypatch.setattr(pipeline, "chunk_text", lambda text: [f"clause of {text}"])
+    monkeypatch.setattr(pipeline, "get_index", lambda profile=None: idx)
+    monkeypatch.setattr(pipeline, "embed_texts", lambda texts: np.ones((len(texts), 1024), dtype=np.float32))
+    monkeypatch.setattr(ChunkRegistry, "load", staticmethod(load))
+    monkeypatch.setattr(ChunkRegistry, "save", save)
+    return idx, loads
+
+def test_registry_loaded_once_across_files(monkeypatch, tmp_path):
+    idx, loads = _fake_corpus(monkeypatch, [])
+
+    async def main():
+        await pipeline.index_file(tmp_path / "policy-a.pdf")
+        await pipeline.index_file(tmp_path / "policy-b.pdf")
+
+    asyncio.run(main())
+    assert len(loads) == 1
+    assert len(idx.upserted) == 2
+
+def test_conflicting_save_reloads_registry(monkeypatch, tmp_path):
+    idx, loads = _fake_corpus(monkeypatch, ["conflict", "ok"])
+    assert asyncio.run(pipeline.index_file(tmp_path / "policy-a.pdf")) == 1
+    assert len(loads) == 2
+    assert idx.deleted == []   # the retry kept every chunk it had upserted
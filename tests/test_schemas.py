@@ -0,0 +1,13 @@
+from app.schemas import MultiQuestionRequest
+
+def test_document_urls_accepts_string_or_list():
+    one = MultiQuestionRequest(documents="https://a/x.pdf", questions=["q"])
+    many = MultiQuestionRequest(documents=["https://a/x.pdf", "https://b/y.pdf"], questions=["q"])
+    assert one.document_urls() == ["https://a/x.pdf"]
+    assert many.document_urls() == ["https://a/x.pdf", "https://b/y.pdf"]
+
+def test_empty_document_list_rejected():
+    import pytest
+    from pydantic import ValidationError
+    with pytest.raises(ValidationError):
+        MultiQuestionRequest(documents=[], questions=["q"])
@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+from app.singleflight import SingleFlight
+
+def test_concurrent_calls_share_one_run():
+    sf = SingleFlight()
+    runs = []
+
+    async def work(x):
+        runs.append(x)
+        await asyncio.sleep(0.01)
+        return x * 2
+
+    async def main():
+        return await asyncio.gather(*(sf.do("doc", work, 3) for _ in range(5)))
+
+    assert asyncio.run(main()) == [6] * 5
+    assert len(runs) == 1
+    assert not sf.in_flight("doc")
+
+def test_leader_error_propagates_to_all_waiters():
+    sf = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise ValueError("download failed")
+
+    async def main():
+        return await asyncio.gather(*(sf.do("doc", boom) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+
+def test_cancelled_waiter_does_not_cancel_others():
+    sf = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    async def main():
+        first  = asyncio.create_task(sf.do("doc", work))
+        second = asyncio.create_task(sf.do("doc", work))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "ok"
@@ -0,0 +1,5 @@
+from app.utils import estimate_tokens
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a" * 400) == 100